@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Computerized adaptive testing (CAT) over the QuestionGenerator question banks
+
+Instead of a fixed-length questionnaire, the client sends the answers given so
+far and gets back the current per-dimension estimates with their uncertainty
+and the most informative next question, until every dimension is estimated
+confidently enough. The server keeps no state between steps.
+
+Run this module to simulate adaptive and full-length assessments on
+DatasetLoader's synthetic respondents.
+"""
+
+import argparse
+import math
+import time
+import numpy as np
+from question_generator import MBTI_DIMENSIONS, MBTI_PAIRS, OCEAN_TRAITS
+
+# OCEAN prior: a trait score's answers are assumed to vary with this variance,
+# weighted as this many answers, until enough answers are in to estimate it
+OCEAN_PRIOR_VARIANCE = 1.0
+OCEAN_PRIOR_WEIGHT = 2
+
+def first_letter_table(max_answers):
+    """Probability that a respondent prefers the first letter of an MBTI pair
+
+    Entry [a, b] is for a answers choosing the pair's first letter and b the
+    second, under a uniform Beta prior on the respondent's preference p for the
+    first letter: P(p > 0.5) with p ~ Beta(a + 1, b + 1). For integer
+    parameters that is a binomial tail, so no special functions are needed.
+    """
+    table = np.full((max_answers + 1, max_answers + 1), 0.5)
+    for a in range(max_answers + 1):
+        for b in range(max_answers + 1 - a):
+            trials = a + b + 1
+            table[a, b] = sum(math.comb(trials, k) for k in range(a + 1)) / 2 ** trials
+    return table
+
+def binary_entropy(p):
+    p = np.clip(p, 1e-12, 1 - 1e-12)
+    return -(p * np.log2(p) + (1 - p) * np.log2(1 - p))
+
+class AdaptiveTester:
+    """Chooses the next question and decides when to stop
+
+    An MBTI assessment stops once each letter pair is decided with probability
+    `mbti_confidence`; an OCEAN assessment once each trait score's standard
+    error is at most `ocean_max_standard_error`. Either also stops after
+    `max_questions` answers (0 for the whole bank) or when no remaining question
+    can improve an undecided dimension.
+    """
+
+    def __init__(self, question_generator, mbti_confidence=0.9, ocean_max_standard_error=0.35, max_questions=0):
+        self.question_generator = question_generator
+        self.mbti_confidence = mbti_confidence
+        self.ocean_max_standard_error = ocean_max_standard_error
+        self.max_questions = max_questions
+        self._compile_mbti_options()
+        self._compile_ocean_items()
+
+    def _compile_mbti_options(self):
+        """Letter pair and side (0 first, 1 second) of every MBTI answer option, padded with -1"""
+        questions = self.question_generator.mbti_questions
+        num_options = max(len(q["dimensions"]) for q in questions)
+        dimensions = np.full((len(questions), num_options), -1)
+        for i, question in enumerate(questions):
+            dimensions[i, :len(question["dimensions"])] = [MBTI_DIMENSIONS.index(d) for d in question["dimensions"]]
+
+        self.mbti_option_valid = dimensions >= 0
+        self.mbti_option_pair = np.where(self.mbti_option_valid, dimensions // 2, 0)
+        self.mbti_option_side = np.where(self.mbti_option_valid, dimensions % 2, 0)
+        # Enough rows for every answer of the bank to land on a single pair
+        first_letter = first_letter_table(len(questions) + 1)
+        self.mbti_letter_error = np.minimum(first_letter, 1 - first_letter)
+        self.mbti_letter_entropy = binary_entropy(first_letter)
+
+    def _compile_ocean_items(self):
+        """Trait index and keying of every OCEAN question"""
+        generator = self.question_generator
+        self.ocean_trait = generator.ocean_membership.argmax(axis=0)
+        self.ocean_sign = generator.ocean_weights.sum(axis=0)
+        self.ocean_offset = generator.ocean_offsets.sum(axis=0)
+
+    def question_limit(self, bank_size):
+        return min(self.max_questions, bank_size) if self.max_questions > 0 else bank_size
+
+    def mbti_step(self, answers, question_ids):
+        """Estimate each letter pair from the answers so far and pick the next question
+
+        Returns a dict with `done`, the bank position of the next question
+        (None when done) and per-pair estimates with the leading letter, the
+        probability it is right and the number of answers on that pair.
+        """
+        generator = self.question_generator
+        positions = generator.question_positions(question_ids, "mbti")
+        counts = np.zeros((len(MBTI_PAIRS), 2), dtype=int)
+        for answer, position in zip(answers, positions):
+            dimension = generator.mbti_answer_dimensions[position].get(answer, generator.mbti_default_dimensions[position])
+            counts[dimension // 2, dimension % 2] += 1
+
+        error = self.mbti_letter_error[counts[:, 0], counts[:, 1]]
+        estimates = {
+            first + second: {
+                # Ties go to the second letter, as in QuestionGenerator scoring
+                "letter": first if counts[k, 0] > counts[k, 1] else second,
+                "confidence": float(1 - error[k]),
+                "answers": int(counts[k].sum())
+            }
+            for k, (first, second) in enumerate(MBTI_PAIRS)
+        }
+
+        next_position = None
+        undecided = error > 1 - self.mbti_confidence
+        if undecided.any() and len(positions) < self.question_limit(len(generator.mbti_questions)):
+            gain = self.mbti_expected_gain(counts, undecided)
+            gain[positions] = -1
+            best = int(gain.argmax())
+            if gain[best] > 0:
+                next_position = best
+
+        return {"done": next_position is None, "next_position": next_position, "estimates": estimates}
+
+    def mbti_expected_gain(self, counts, undecided):
+        """Expected information gained on the undecided pairs' letters from asking each question
+
+        Gain is the expected drop in the entropy of which letter leads; the
+        error probability itself would not do, since one answer that cannot
+        flip a letter leaves its expected value unchanged. A respondent is
+        assumed to pick an option in proportion to their estimated preference
+        for the option's letter.
+        """
+        pair, side = self.mbti_option_pair, self.mbti_option_side
+        first_share = (counts[:, 0] + 1) / (counts.sum(axis=1) + 2)
+        preference = np.where(side == 0, first_share[pair], 1 - first_share[pair]) * self.mbti_option_valid
+        choice_probability = preference / preference.sum(axis=1, keepdims=True)
+
+        new_first = counts[pair, 0] + (side == 0)
+        new_second = counts[pair, 1] + (side == 1)
+        entropy = self.mbti_letter_entropy[counts[:, 0], counts[:, 1]]
+        entropy_drop = (entropy[pair] - self.mbti_letter_entropy[new_first, new_second]) * undecided[pair]
+        return (choice_probability * entropy_drop).sum(axis=1)
+
+    def ocean_step(self, answers, question_ids):
+        """Estimate each trait from the answers so far and pick the next question
+
+        Returns a dict with `done`, the bank position of the next question
+        (None when done) and per-trait estimates with the score, its standard
+        error (None before the first answer) and the number of answers.
+        """
+        generator = self.question_generator
+        if any(not 1 <= answer <= 5 for answer in answers):
+            raise ValueError("Answers must be on a 1-5 scale")
+        positions = np.array(generator.question_positions(question_ids, "ocean"), dtype=int)
+
+        traits = self.ocean_trait[positions]
+        scored = self.ocean_sign[positions] * np.asarray(answers, dtype=float) + self.ocean_offset[positions]
+        n = np.bincount(traits, minlength=len(OCEAN_TRAITS))
+        total = np.bincount(traits, scored, minlength=len(OCEAN_TRAITS))
+        total_squares = np.bincount(traits, scored ** 2, minlength=len(OCEAN_TRAITS))
+
+        answered = n > 0
+        mean = np.divide(total, n, out=np.zeros(len(OCEAN_TRAITS)), where=answered)
+        # Answer variance shrunk towards the prior while there are few answers
+        variance = (OCEAN_PRIOR_WEIGHT * OCEAN_PRIOR_VARIANCE + total_squares - n * mean ** 2) / (OCEAN_PRIOR_WEIGHT + n - 1)
+        standard_error = np.full(len(OCEAN_TRAITS), np.inf)
+        standard_error[answered] = np.sqrt(variance[answered] / n[answered])
+
+        estimates = {
+            trait: {
+                "score": float(mean[k]),
+                "standard_error": float(standard_error[k]) if answered[k] else None,
+                "answers": int(n[k])
+            }
+            for k, trait in enumerate(OCEAN_TRAITS)
+        }
+
+        next_position = None
+        if len(positions) < self.question_limit(len(generator.ocean_questions)):
+            remaining = np.ones(len(generator.ocean_questions), dtype=bool)
+            remaining[positions] = False
+            has_remaining = np.bincount(self.ocean_trait[remaining], minlength=len(OCEAN_TRAITS)) > 0
+            candidates = np.where(has_remaining & (standard_error > self.ocean_max_standard_error), standard_error, -1)
+            if candidates.max() >= 0:
+                # Ask the least certain trait's next unanswered question
+                trait = int(candidates.argmax())
+                next_position = int(np.flatnonzero(remaining & (self.ocean_trait == trait))[0])
+
+        return {"done": next_position is None, "next_position": next_position, "estimates": estimates}
+
+def run_adaptive(step, responses, question_ids):
+    """Answer adaptively chosen questions from a respondent's full response list
+
+    Returns the answers and question ids that were asked, in order.
+    """
+    answers, asked = [], []
+    while True:
+        outcome = step(answers, asked)
+        if outcome["done"]:
+            return answers, asked
+        answers.append(responses[outcome["next_position"]])
+        asked.append(question_ids[outcome["next_position"]])
+
+def simulate_mbti(tester, n_respondents, consistency, seed):
+    """Compare adaptive and full-length MBTI assessments on synthetic respondents
+
+    Respondents take their types from DatasetLoader's sample MBTI dataset and
+    pick an option matching one of their letters with probability
+    `consistency`, otherwise any other option.
+    """
+    from data_loader import DatasetLoader
+
+    generator = tester.question_generator
+    question_ids = [q["id"] for q in generator.mbti_questions]
+    types = DatasetLoader().create_sample_mbti_dataset(n_respondents, seed)["type"].values
+    rng = np.random.RandomState(seed)
+
+    lengths, steps_seconds, agree_full, adaptive_correct, full_correct = [], [], 0, 0, 0
+    for true_type in types:
+        responses = []
+        for question in generator.mbti_questions:
+            matching = [o for o, d in zip(question["options"], question["dimensions"]) if d in true_type]
+            others = [o for o, d in zip(question["options"], question["dimensions"]) if d not in true_type]
+            pool = matching if matching and (not others or rng.rand() < consistency) else others
+            responses.append(pool[rng.randint(len(pool))])
+
+        started = time.perf_counter()
+        answers, asked = run_adaptive(tester.mbti_step, responses, question_ids)
+        steps_seconds.append((time.perf_counter() - started) / (len(answers) + 1))
+
+        adaptive_type = generator.calculate_mbti_score(answers, asked)[0]
+        full_type = generator.calculate_mbti_score(responses, question_ids)[0]
+        lengths.append(len(answers))
+        agree_full += adaptive_type == full_type
+        adaptive_correct += adaptive_type == true_type
+        full_correct += full_type == true_type
+
+    return {
+        "questions_full": len(question_ids),
+        "questions_mean": float(np.mean(lengths)),
+        "questions_p90": float(np.percentile(lengths, 90)),
+        "agreement_with_full": agree_full / len(types),
+        "accuracy_adaptive": adaptive_correct / len(types),
+        "accuracy_full": full_correct / len(types),
+        "step_ms_mean": 1000 * float(np.mean(steps_seconds))
+    }
+
+def simulate_ocean(tester, n_respondents, noise, seed):
+    """Compare adaptive and full-length OCEAN assessments on synthetic respondents
+
+    Respondents take their true trait scores from DatasetLoader's sample OCEAN
+    dataset and answer each question with that trait's score plus Gaussian
+    noise of standard deviation `noise`, rounded to the 1-5 scale.
+    """
+    from data_loader import DatasetLoader
+
+    generator = tester.question_generator
+    question_ids = [q["id"] for q in generator.ocean_questions]
+    true_scores = DatasetLoader().create_sample_ocean_dataset(n_respondents, seed)[OCEAN_TRAITS].values
+    rng = np.random.RandomState(seed)
+
+    levels = true_scores[:, tester.ocean_trait]
+    raw = np.clip(np.rint(levels + rng.normal(0, noise, levels.shape)), 1, 5)
+    # Reverse-keyed questions are answered on the flipped scale
+    responses = np.where(tester.ocean_sign < 0, 6 - raw, raw).astype(int)
+
+    lengths, steps_seconds, adaptive_error, full_error, difference = [], [], [], [], []
+    for row, truth in zip(responses, true_scores):
+        row = row.tolist()
+        started = time.perf_counter()
+        answers, asked = run_adaptive(tester.ocean_step, row, question_ids)
+        steps_seconds.append((time.perf_counter() - started) / (len(answers) + 1))
+
+        adaptive = np.array(list(generator.calculate_ocean_scores(answers, asked).values()))
+        full = np.array(list(generator.calculate_ocean_scores(row, question_ids).values()))
+        lengths.append(len(answers))
+        adaptive_error.append(np.abs(adaptive - truth).mean())
+        full_error.append(np.abs(full - truth).mean())
+        difference.append(np.abs(adaptive - full).mean())
+
+    return {
+        "questions_full": len(question_ids),
+        "questions_mean": float(np.mean(lengths)),
+        "questions_p90": float(np.percentile(lengths, 90)),
+        "mean_abs_error_adaptive": float(np.mean(adaptive_error)),
+        "mean_abs_error_full": float(np.mean(full_error)),
+        "mean_abs_difference_from_full": float(np.mean(difference)),
+        "step_ms_mean": 1000 * float(np.mean(steps_seconds))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate adaptive against full-length assessments")
+    parser.add_argument("--respondents", type=int, default=1000, help="synthetic respondents per assessment")
+    parser.add_argument("--mbti-confidence", type=float, default=0.9)
+    parser.add_argument("--ocean-max-standard-error", type=float, default=0.35)
+    parser.add_argument("--consistency", type=float, default=0.8, help="chance an MBTI respondent answers in line with their type")
+    parser.add_argument("--noise", type=float, default=0.8, help="standard deviation of OCEAN answers around the true score")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from question_generator import QuestionGenerator
+    tester = AdaptiveTester(QuestionGenerator(), args.mbti_confidence, args.ocean_max_standard_error)
+
+    for name, results in [
+        ("MBTI", simulate_mbti(tester, args.respondents, args.consistency, args.seed)),
+        ("OCEAN", simulate_ocean(tester, args.respondents, args.noise, args.seed))
+    ]:
+        print(f"{name} ({args.respondents} synthetic respondents)")
+        for key, value in results.items():
+            print(f"  {key}: {value:.3f}")
+
+if __name__ == "__main__":
+    main()
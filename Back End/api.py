@@ -1,13 +1,41 @@
-from fastapi import FastAPI, HTTPException
+import time
+
+# Start of the API's own import, the reference point for startup timings
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
+import asyncio
+import json
 import os
+import secrets
 import numpy as np
-from data_loader import DatasetLoader
-from models import MBTIModel, OCEANModel
 from question_generator import QuestionGenerator
-from config import MODEL_SAVE_PATH
+from training_jobs import TrainingJobManager, TrainingJobRunning
+from inference_executor import InferenceExecutor, ExecutorSaturated
+from batcher import MicroBatcher
+from model_registry import ModelRegistry
+from response_cache import ResponseCache, CachedResponse, json_response, make_etag
+from question_tokens import encode_question_token, decode_question_token
+from adaptive import AdaptiveTester
+from result_store import ResultStore, create_result_backend
+from sessions import SessionManager
+from metrics import REGISTRY, RequestMetricsMiddleware
+from config import (
+    MODEL_SAVE_PATH, MODEL_MMAP_MODE, INFERENCE_EXECUTOR, INFERENCE_WORKERS,
+    INFERENCE_MAX_PENDING, INFERENCE_RETRY_AFTER, PREDICT_BATCHING,
+    PREDICT_BATCH_MAX_SIZE, PREDICT_BATCH_WINDOW_MS, MODEL_BACKGROUND_LOAD,
+    PRELOAD_MODELS, MODEL_WATCH_INTERVAL, CATALOG_MAX_AGE, QUESTION_TOKEN_SECRET,
+    ADAPTIVE_MBTI_CONFIDENCE, ADAPTIVE_OCEAN_MAX_STANDARD_ERROR, ADAPTIVE_MAX_QUESTIONS,
+    RESULT_STORE, RESULT_STORE_PATH, RESULT_FLUSH_SIZE, RESULT_FLUSH_INTERVAL, RESULT_MAX_BACKLOG,
+    SESSION_TTL, SESSION_MAX, SESSION_EVICT_INTERVAL
+)
+
+# Seconds spent in each startup phase, reported by /health
+startup_timings = {"imports": time.perf_counter() - IMPORT_STARTED}
 
 app = FastAPI(title="Personality Assessment API", version="1.0.0")
 
@@ -18,13 +46,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Question-Token"],
 )
+app.add_middleware(RequestMetricsMiddleware)
+
+# Point-in-time values, read from their components whenever /metrics is scraped
+INFERENCE_PENDING = REGISTRY.gauge("inference_pending_calls", "Inference calls queued or running")
+PREDICT_BATCH_SIZE = REGISTRY.gauge("predict_batch_mean_size", "Mean answer sets per coalesced prediction call", ("kind",))
+RESULT_BACKLOG = REGISTRY.gauge("result_store_backlog", "Results waiting to be written")
+SESSIONS_ACTIVE = REGISTRY.gauge("assessment_sessions_active", "Assessment sessions in memory")
+MODELS_LOADED = REGISTRY.gauge("models_loaded", "Whether each model is loaded", ("model",))
 
 # Global variables for models and data
 mbti_model = None
 ocean_model = None
+active_model_version = None
+models_loading = False
+model_load_task = None
+model_watch_task = None
+result_flush_task = None
+session_eviction_task = None
+model_registry = ModelRegistry(MODEL_SAVE_PATH)
+model_swap_lock = asyncio.Lock()
+
+question_bank_started = time.perf_counter()
 question_generator = QuestionGenerator()
-data_loader = DatasetLoader()
+response_cache = ResponseCache()
+adaptive_tester = AdaptiveTester(
+    question_generator, ADAPTIVE_MBTI_CONFIDENCE, ADAPTIVE_OCEAN_MAX_STANDARD_ERROR, ADAPTIVE_MAX_QUESTIONS
+)
+session_manager = SessionManager(question_generator, ttl=SESSION_TTL, max_sessions=SESSION_MAX)
+startup_timings["question_bank"] = time.perf_counter() - question_bank_started
 
 # Pydantic models for request/response
 class QuestionResponse(BaseModel):
@@ -45,36 +97,284 @@ class MBTIResult(BaseModel):
     mbti_type: str
     confidence: float
     breakdown: Dict[str, float]
+    result_id: Optional[str] = None
 
 class OCEANResult(BaseModel):
     scores: Dict[str, float]
     interpretation: Dict[str, str]
+    result_id: Optional[str] = None
+
+class SessionAnswer(BaseModel):
+    question_id: int
+    answer: Union[int, str]  # option text for MBTI, 1-5 for OCEAN
+
+class SessionState(BaseModel):
+    session_id: str
+    kind: str
+    answered: int
+    total_questions: int
+    expires_in: float
+    partial_result: Optional[Union[MBTIResult, OCEANResult]] = None
+
+class StoredResult(BaseModel):
+    result_id: str
+    kind: str
+    created_at: float
+    model_version: Optional[str] = None
+    answers: List[Dict[str, Any]]
+    result: Dict[str, Any]
+
+class MBTIPairEstimate(BaseModel):
+    letter: str
+    confidence: float
+    answers: int
+
+class OCEANTraitEstimate(BaseModel):
+    score: float
+    standard_error: Optional[float] = None
+    answers: int
+
+class AdaptiveMBTIStep(BaseModel):
+    done: bool
+    estimates: Dict[str, MBTIPairEstimate]
+    next_question: Optional[QuestionResponse] = None
+    result: Optional[MBTIResult] = None
+
+class AdaptiveOCEANStep(BaseModel):
+    done: bool
+    estimates: Dict[str, OCEANTraitEstimate]
+    next_question: Optional[QuestionResponse] = None
+    result: Optional[OCEANResult] = None
+
+class MBTIBatchItem(BaseModel):
+    index: int
+    result: Optional[MBTIResult] = None
+    error: Optional[str] = None
+
+class OCEANBatchItem(BaseModel):
+    index: int
+    result: Optional[OCEANResult] = None
+    error: Optional[str] = None
+
+OCEAN_TRAIT_NAMES = {
+    "O": "Openness",
+    "C": "Conscientiousness",
+    "E": "Extraversion",
+    "A": "Agreeableness",
+    "N": "Neuroticism"
+}
+
+class TrainingJobResponse(BaseModel):
+    job_id: str
+    status: str
+    stage: Optional[str] = None
+    progress: float
+    metrics: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float
+    finished_at: Optional[float] = None
+
+# Catalog served by /mbti-types
+MBTI_TYPE_INFO = [
+    {"code": "INTJ", "name": "The Architect", "description": "Imaginative and strategic thinkers"},
+    {"code": "INTP", "name": "The Thinker", "description": "Innovative inventors with an unquenchable thirst for knowledge"},
+    {"code": "ENTJ", "name": "The Commander", "description": "Bold, imaginative and strong-willed leaders"},
+    {"code": "ENTP", "name": "The Debater", "description": "Smart and curious thinkers who cannot resist an intellectual challenge"},
+    {"code": "INFJ", "name": "The Advocate", "description": "Creative and insightful, inspired by their own values"},
+    {"code": "INFP", "name": "The Mediator", "description": "Poetic, kind and altruistic people"},
+    {"code": "ENFJ", "name": "The Protagonist", "description": "Charismatic and inspiring leaders"},
+    {"code": "ENFP", "name": "The Campaigner", "description": "Enthusiastic, creative and sociable free spirits"},
+    {"code": "ISTJ", "name": "The Logistician", "description": "Practical and fact-minded, reliable"},
+    {"code": "ISFJ", "name": "The Protector", "description": "Very dedicated and warm protectors"},
+    {"code": "ESTJ", "name": "The Executive", "description": "Excellent administrators, unsurpassed at managing things"},
+    {"code": "ESFJ", "name": "The Consul", "description": "Extraordinarily caring, social and popular"},
+    {"code": "ISTP", "name": "The Virtuoso", "description": "Bold and practical experimenters"},
+    {"code": "ISFP", "name": "The Adventurer", "description": "Flexible and charming artists"},
+    {"code": "ESTP", "name": "The Entrepreneur", "description": "Smart, energetic and very perceptive people"},
+    {"code": "ESFP", "name": "The Entertainer", "description": "Spontaneous, energetic and enthusiastic people"}
+]
+
+def interpret_ocean_scores(scores: Dict[str, float]) -> Dict[str, str]:
+    """Describe each OCEAN trait score as high or low"""
+    return {
+        trait: f"{'High' if score > 3.5 else 'Low'} {OCEAN_TRAIT_NAMES[trait]}"
+        for trait, score in scores.items()
+    }
+
+def load_models():
+    """Load the active model version, returning (version, mbti_model, ocean_model)"""
+    # Imported here so the model stack loads after the server is already up
+    from models import load_saved_models
+    version = model_registry.active_version()
+    mbti, ocean = load_saved_models(model_registry.active_dir(), MODEL_MMAP_MODE)
+    return version, mbti, ocean
+
+def require_model(model, name):
+    """Reject a prediction when its model is missing, with 503 while models are still loading"""
+    if model is not None:
+        return
+    if models_loading:
+        raise HTTPException(status_code=503, detail="Models are still loading", headers={"Retry-After": str(INFERENCE_RETRY_AFTER)})
+    raise HTTPException(status_code=400, detail=f"{name} model not trained yet")
+
+async def reload_active_models(force=False):
+    """Load the active model version and swap it in if it is not already served
+    
+    Loading runs off the event loop and both models are swapped in one step.
+    Requests already in flight keep the model objects they started with; new
+    requests pick up the new ones.
+    """
+    global mbti_model, ocean_model, active_model_version
+    async with model_swap_lock:
+        if not force and model_registry.active_version() == active_model_version:
+            return False
+        loop = asyncio.get_running_loop()
+        version, mbti, ocean = await loop.run_in_executor(None, load_models)
+        mbti_model, ocean_model, active_model_version = mbti, ocean, version
+    inference.restart()
+    return True
+
+async def watch_active_models():
+    """Hot-swap models whenever the registry's active version changes"""
+    while True:
+        await asyncio.sleep(MODEL_WATCH_INTERVAL)
+        try:
+            if await reload_active_models():
+                print(f"Switched to model version {active_model_version}")
+        except Exception as e:
+            print(f"Error reloading models: {str(e)}")
+
+async def evict_expired_sessions():
+    """Drop expired assessment sessions every SESSION_EVICT_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(SESSION_EVICT_INTERVAL)
+        session_manager.evict_expired()
+
+async def install_trained_models(job):
+    """Swap in the models a training job published and activated"""
+    await reload_active_models()
+
+training_jobs = TrainingJobManager(on_success=install_trained_models)
+
+inference = InferenceExecutor(
+    resolve_target=lambda name: globals()[name],
+    kind=INFERENCE_EXECUTOR,
+    workers=INFERENCE_WORKERS,
+    max_pending=INFERENCE_MAX_PENDING,
+    retry_after=INFERENCE_RETRY_AFTER
+)
+
+async def run_inference(target, method, *args):
+    """Run a CPU-bound call on the inference executor, answering 503 when it is saturated"""
+    try:
+        return await inference.call(target, method, *args)
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+async def score_answer_sets(method, requests):
+    """Score (answers, question_ids) requests in one vectorized call"""
+    outcomes = await run_inference(
+        "question_generator", method, [r[0] for r in requests], [r[1] for r in requests]
+    )
+    return [result if error is None else ValueError(error) for result, error in outcomes]
+
+def create_predict_batcher(method):
+    """Coalescer in front of a QuestionGenerator batch scoring method"""
+    return MicroBatcher(
+        lambda requests: score_answer_sets(method, requests),
+        max_batch_size=PREDICT_BATCH_MAX_SIZE if PREDICT_BATCHING else 1,
+        max_wait=PREDICT_BATCH_WINDOW_MS / 1000,
+        max_in_flight=INFERENCE_WORKERS
+    )
+
+mbti_batcher = create_predict_batcher("score_mbti_answer_sets")
+ocean_batcher = create_predict_batcher("score_ocean_answer_sets")
+
+# Write-behind persistence of every assessment result; RESULT_STORE=none disables it
+result_store = None if RESULT_STORE == "none" else ResultStore(
+    create_result_backend(RESULT_STORE, RESULT_STORE_PATH),
+    flush_size=RESULT_FLUSH_SIZE,
+    flush_interval=RESULT_FLUSH_INTERVAL,
+    max_backlog=RESULT_MAX_BACKLOG
+)
+
+def store_result(kind, answers, result):
+    """Queue a result for persistence and set its result_id"""
+    if result_store is not None:
+        result.result_id = result_store.add(
+            kind, [a.model_dump() for a in answers], result.model_dump(exclude={"result_id"}), active_model_version
+        )
+    return result
+
+async def load_startup_models():
+    """Load existing models off the event loop and record how long it took"""
+    global models_loading
+    started = time.perf_counter()
+    try:
+        await reload_active_models(force=True)
+    except Exception as e:
+        print(f"Error loading models: {str(e)}")
+    finally:
+        models_loading = False
+        startup_timings["models"] = time.perf_counter() - started
+        startup_timings["ready"] = time.perf_counter() - IMPORT_STARTED
+
+def preload_models():
+    """Load the models while the module is imported
+    
+    Under a pre-forking server (gunicorn --preload) this runs once in the
+    master, and every forked worker shares the loaded models copy-on-write.
+    """
+    global mbti_model, ocean_model, active_model_version
+    started = time.perf_counter()
+    os.makedirs(MODEL_SAVE_PATH, exist_ok=True)
+    active_model_version, mbti_model, ocean_model = load_models()
+    startup_timings["models"] = time.perf_counter() - started
+
+if PRELOAD_MODELS:
+    preload_models()
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize models on startup"""
-    global mbti_model, ocean_model
+    global models_loading, model_load_task, model_watch_task, result_flush_task, session_eviction_task
     
-    # Create models directory
-    os.makedirs(MODEL_SAVE_PATH, exist_ok=True)
+    if result_store is not None:
+        result_flush_task = asyncio.create_task(result_store.run())
+    session_eviction_task = asyncio.create_task(evict_expired_sessions())
     
-    # Try to load existing models
-    mbti_path = os.path.join(MODEL_SAVE_PATH, "mbti_model.pkl")
-    ocean_path = os.path.join(MODEL_SAVE_PATH, "ocean_model.pkl")
+    # Pick up versions activated by training jobs, rollbacks or other workers
+    if MODEL_WATCH_INTERVAL > 0:
+        model_watch_task = asyncio.create_task(watch_active_models())
     
-    if os.path.exists(mbti_path):
-        mbti_model = MBTIModel()
-        mbti_model.load(mbti_path)
-        print("Loaded existing MBTI model")
-    else:
-        print("No existing MBTI model found. Train models first.")
+    if PRELOAD_MODELS:
+        startup_timings["serving"] = startup_timings["ready"] = time.perf_counter() - IMPORT_STARTED
+        return
     
-    if os.path.exists(ocean_path):
-        ocean_model = OCEANModel()
-        ocean_model.load(ocean_path)
-        print("Loaded existing OCEAN model")
-    else:
-        print("No existing OCEAN model found. Train models first.")
+    # Create models directory
+    os.makedirs(MODEL_SAVE_PATH, exist_ok=True)
+    
+    # Try to load existing models; in the background by default, so /health
+    # answers while they load
+    models_loading = True
+    model_load_task = asyncio.create_task(load_startup_models())
+    if not MODEL_BACKGROUND_LOAD:
+        await model_load_task
+    startup_timings["serving"] = time.perf_counter() - IMPORT_STARTED
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if model_watch_task is not None:
+        model_watch_task.cancel()
+    if session_eviction_task is not None:
+        session_eviction_task.cancel()
+    # Finish queued predictions before their results are flushed
+    await mbti_batcher.close()
+    await ocean_batcher.close()
+    if result_flush_task is not None:
+        result_flush_task.cancel()
+        await result_store.close()
+    inference.shutdown()
 
 @app.get("/")
 async def root():
@@ -82,54 +382,104 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "mbti_model_loaded": mbti_model is not None, "ocean_model_loaded": ocean_model is not None}
+    return {
+        "status": "healthy",
+        "mbti_model_loaded": mbti_model is not None,
+        "ocean_model_loaded": ocean_model is not None,
+        "models_loading": models_loading,
+        "model_version": active_model_version,
+        "startup_seconds": startup_timings
+    }
 
-@app.post("/train-models")
-async def train_models():
-    """Train both MBTI and OCEAN models"""
+@app.post("/train-models", status_code=202)
+async def train_models() -> TrainingJobResponse:
+    """Start training both MBTI and OCEAN models in a background process"""
     try:
-        # Download and preprocess data
-        print("Downloading and preprocessing data...")
-        mbti_X, mbti_y, mbti_features = data_loader.download_mbti_dataset()
-        ocean_X, ocean_y, ocean_features, ocean_cols = data_loader.download_ocean_dataset()
-        
-        # Train MBTI model
-        global mbti_model
-        mbti_model = MBTIModel()
-        mbti_accuracy = mbti_model.train(mbti_X, mbti_y)
-        mbti_model.save(os.path.join(MODEL_SAVE_PATH, "mbti_model.pkl"))
-        
-        # Train OCEAN model
-        global ocean_model
-        ocean_model = OCEANModel()
-        ocean_mse = ocean_model.train(ocean_X, ocean_y)
-        ocean_model.save(os.path.join(MODEL_SAVE_PATH, "ocean_model.pkl"))
-        
-        return {
-            "message": "Models trained successfully",
-            "mbti_accuracy": mbti_accuracy,
-            "ocean_mse": ocean_mse
-        }
+        job = training_jobs.submit()
+    except TrainingJobRunning as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error training models: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error starting training job: {str(e)}")
+    
+    return TrainingJobResponse(**job.to_dict())
 
-@app.get("/questions/mbti")
-async def get_mbti_questions(num_questions: int = 20) -> List[QuestionResponse]:
-    """Get MBTI questions"""
-    questions = question_generator.get_mbti_questions(num_questions)
-    return [QuestionResponse(**q) for q in questions]
+@app.get("/train-models/{job_id}")
+async def get_training_job(job_id: str) -> TrainingJobResponse:
+    """Report the progress and metrics of a training job"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Training job {job_id} not found")
+    
+    return TrainingJobResponse(**job.to_dict())
+
+def serialized_questions(kind):
+    """JSON of every question in a bank, serialized once per bank version"""
+    bank = question_generator.mbti_questions if kind == "mbti" else question_generator.ocean_questions
+    return response_cache.get(question_generator.bank_version, f"{kind}-questions", lambda: [
+        QuestionResponse(**q).model_dump_json().encode() for q in bank
+    ])
+
+def resolve_question_token(token, kind):
+    """Recompute the question positions a token was issued for, or raise a 400"""
+    try:
+        token_kind, bank_version, num_questions, seed = decode_question_token(QUESTION_TOKEN_SECRET, token)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if token_kind != kind:
+        raise HTTPException(status_code=400, detail=f"Question token is for {token_kind.upper()} questions")
+    if bank_version != question_generator.bank_version:
+        raise HTTPException(status_code=400, detail="Question token is for an older question bank")
+    return question_generator.sample_positions(kind, num_questions, seed)
 
-@app.get("/questions/ocean")
-async def get_ocean_questions(num_questions: int = 40) -> List[QuestionResponse]:
-    """Get OCEAN questions"""
-    questions = question_generator.get_ocean_questions(num_questions)
-    return [QuestionResponse(**q) for q in questions]
+def check_question_token(token, kind, question_ids):
+    """Reject answers to questions outside the set a question token was issued for"""
+    if token is None:
+        return
+    bank = question_generator.mbti_questions if kind == "mbti" else question_generator.ocean_questions
+    issued_ids = {bank[i]["id"] for i in resolve_question_token(token, kind)}
+    for question_id in question_ids:
+        if question_id not in issued_ids:
+            raise HTTPException(status_code=400, detail=f"Question {question_id} was not issued with this question token")
+
+def questions_response(kind, request, num_questions, seed, token):
+    """Sample questions and assemble the list from pre-serialized questions
+    
+    The sample is drawn from `seed`, or from a fresh random seed, and the
+    X-Question-Token header carries what is needed to recompute it. Passing
+    that token back returns the same questions. The ETag covers the bank
+    version and the selected questions in order, so refetching a selection
+    gets 304 Not Modified; only seeded or tokened lists may be cached.
+    """
+    reproducible = seed is not None or token is not None
+    if token is not None:
+        positions = resolve_question_token(token, kind)
+    else:
+        if seed is None:
+            seed = secrets.randbits(63)
+        # Only explicitly seeded samples are likely to be asked for again
+        positions = question_generator.sample_positions(kind, num_questions, seed, cache=reproducible)
+        token = encode_question_token(QUESTION_TOKEN_SECRET, kind, question_generator.bank_version, len(positions), seed)
+    
+    questions = serialized_questions(kind)
+    body = b"[" + b",".join(questions[i] for i in positions) + b"]"
+    etag = make_etag(question_generator.bank_version, kind, *positions)
+    cache_control = f"private, max-age={CATALOG_MAX_AGE}" if reproducible else "no-cache"
+    return json_response(body, etag, cache_control, request.headers.get("if-none-match"), {"X-Question-Token": token})
+
+@app.get("/questions/mbti", response_model=List[QuestionResponse])
+async def get_mbti_questions(request: Request, num_questions: int = 20, seed: Optional[int] = None, token: Optional[str] = None):
+    """Get MBTI questions; a seed or question token makes the selection reproducible"""
+    return questions_response("mbti", request, num_questions, seed, token)
+
+@app.get("/questions/ocean", response_model=List[QuestionResponse])
+async def get_ocean_questions(request: Request, num_questions: int = 40, seed: Optional[int] = None, token: Optional[str] = None):
+    """Get OCEAN questions; a seed or question token makes the selection reproducible"""
+    return questions_response("ocean", request, num_questions, seed, token)
 
 @app.post("/predict/mbti")
-async def predict_mbti(answers: List[MBTIAnswer]) -> MBTIResult:
-    """Predict MBTI type from answers"""
-    if mbti_model is None:
-        raise HTTPException(status_code=400, detail="MBTI model not trained yet")
+async def predict_mbti(answers: List[MBTIAnswer], x_question_token: Optional[str] = Header(None)) -> MBTIResult:
+    """Predict MBTI type from answers, checked against the question token's questions if one is sent"""
+    require_model(mbti_model, "MBTI")
     
     try:
         # Convert answers to feature vector
@@ -138,74 +488,299 @@ async def predict_mbti(answers: List[MBTIAnswer]) -> MBTIResult:
         
         # Use question generator for simple scoring
         answer_texts = [a.answer for a in answers]
-        mbti_type, breakdown, confidence = question_generator.calculate_mbti_score(answer_texts)
+        question_ids = [a.question_id for a in answers]
+        check_question_token(x_question_token, "mbti", question_ids)
+        mbti_type, breakdown, confidence = await mbti_batcher.submit((answer_texts, question_ids))
         
-        return MBTIResult(
+        return store_result("mbti", answers, MBTIResult(
             mbti_type=mbti_type,
             confidence=confidence,
             breakdown=breakdown
-        )
+        ))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error predicting MBTI: {str(e)}")
 
 @app.post("/predict/ocean")
-async def predict_ocean(answers: List[OCEANAnswer]) -> OCEANResult:
-    """Predict OCEAN scores from answers"""
-    if ocean_model is None:
-        raise HTTPException(status_code=400, detail="OCEAN model not trained yet")
+async def predict_ocean(answers: List[OCEANAnswer], x_question_token: Optional[str] = Header(None)) -> OCEANResult:
+    """Predict OCEAN scores from answers, checked against the question token's questions if one is sent"""
+    require_model(ocean_model, "OCEAN")
     
     try:
         # Convert answers to numerical scores
         answer_scores = [a.answer for a in answers]
+        question_ids = [a.question_id for a in answers]
+        check_question_token(x_question_token, "ocean", question_ids)
         
         # Use question generator for simple scoring
-        scores = question_generator.calculate_ocean_scores(answer_scores)
+        scores = await ocean_batcher.submit((answer_scores, question_ids))
         
         # Generate interpretation
-        interpretation = {}
-        for trait, score in scores.items():
-            if trait == "O":
-                interpretation[trait] = "High Openness" if score > 3.5 else "Low Openness"
-            elif trait == "C":
-                interpretation[trait] = "High Conscientiousness" if score > 3.5 else "Low Conscientiousness"
-            elif trait == "E":
-                interpretation[trait] = "High Extraversion" if score > 3.5 else "Low Extraversion"
-            elif trait == "A":
-                interpretation[trait] = "High Agreeableness" if score > 3.5 else "Low Agreeableness"
-            elif trait == "N":
-                interpretation[trait] = "High Neuroticism" if score > 3.5 else "Low Neuroticism"
+        interpretation = interpret_ocean_scores(scores)
         
-        return OCEANResult(
+        return store_result("ocean", answers, OCEANResult(
             scores=scores,
             interpretation=interpretation
-        )
+        ))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error predicting OCEAN: {str(e)}")
 
-@app.get("/mbti-types")
-async def get_mbti_types():
-    """Get information about MBTI types"""
+@app.post("/adaptive/mbti")
+async def adaptive_mbti(answers: List[MBTIAnswer]) -> AdaptiveMBTIStep:
+    """Update MBTI estimates from the answers so far and return the next question, or the result once confident"""
+    require_model(mbti_model, "MBTI")
+    
+    try:
+        answer_texts = [a.answer for a in answers]
+        question_ids = [a.question_id for a in answers]
+        step = adaptive_tester.mbti_step(answer_texts, question_ids)
+        response = AdaptiveMBTIStep(done=step["done"], estimates=step["estimates"])
+        
+        if step["done"]:
+            mbti_type, breakdown, confidence = await mbti_batcher.submit((answer_texts, question_ids))
+            response.result = store_result("mbti", answers, MBTIResult(mbti_type=mbti_type, confidence=confidence, breakdown=breakdown))
+        else:
+            response.next_question = QuestionResponse(**question_generator.mbti_questions[step["next_position"]])
+        
+        return response
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error in adaptive MBTI step: {str(e)}")
+
+@app.post("/adaptive/ocean")
+async def adaptive_ocean(answers: List[OCEANAnswer]) -> AdaptiveOCEANStep:
+    """Update OCEAN estimates from the answers so far and return the next question, or the result once confident"""
+    require_model(ocean_model, "OCEAN")
+    
+    try:
+        answer_scores = [a.answer for a in answers]
+        question_ids = [a.question_id for a in answers]
+        step = adaptive_tester.ocean_step(answer_scores, question_ids)
+        response = AdaptiveOCEANStep(done=step["done"], estimates=step["estimates"])
+        
+        if step["done"]:
+            scores = await ocean_batcher.submit((answer_scores, question_ids))
+            response.result = store_result("ocean", answers, OCEANResult(scores=scores, interpretation=interpret_ocean_scores(scores)))
+        else:
+            response.next_question = QuestionResponse(**question_generator.ocean_questions[step["next_position"]])
+        
+        return response
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error in adaptive OCEAN step: {str(e)}")
+
+def session_result(kind, scored):
+    """Wrap a SessionManager score in the result model /predict/* returns"""
+    if scored is None:
+        return None
+    if kind == "mbti":
+        mbti_type, breakdown, confidence = scored
+        return MBTIResult(mbti_type=mbti_type, confidence=confidence, breakdown=breakdown)
+    return OCEANResult(scores=scored, interpretation=interpret_ocean_scores(scored))
+
+def session_state(session):
+    return SessionState(
+        session_id=session.session_id,
+        kind=session.kind,
+        answered=session.answered,
+        total_questions=len(session.responses),
+        expires_in=max(0.0, session.expires_at - time.monotonic()),
+        partial_result=session_result(session.kind, session_manager.score(session))
+    )
+
+def require_session(session_id):
+    session = session_manager.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired session: {session_id}")
+    return session
+
+@app.post("/sessions/mbti", status_code=201)
+async def create_mbti_session() -> SessionState:
+    """Start an MBTI assessment whose answers are scored as they arrive"""
+    return session_state(session_manager.create("mbti"))
+
+@app.post("/sessions/ocean", status_code=201)
+async def create_ocean_session() -> SessionState:
+    """Start an OCEAN assessment whose answers are scored as they arrive"""
+    return session_state(session_manager.create("ocean"))
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str) -> SessionState:
+    """Progress and partial result of an assessment session"""
+    return session_state(require_session(session_id))
+
+@app.post("/sessions/{session_id}/answers")
+async def answer_session(session_id: str, answers: List[SessionAnswer]) -> SessionState:
+    """Add answers to a session, or change earlier ones, and return the partial result"""
+    session = require_session(session_id)
+    try:
+        session_manager.answer(session, [a.question_id for a in answers], [a.answer for a in answers])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return session_state(session)
+
+@app.post("/sessions/{session_id}/finalize")
+async def finalize_session(session_id: str) -> Union[MBTIResult, OCEANResult]:
+    """Score a session from its running sums, store the result and end the session"""
+    session = require_session(session_id)
+    require_model(mbti_model if session.kind == "mbti" else ocean_model, session.kind.upper())
+    try:
+        result = session_result(session.kind, session_manager.finalize(session))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    answer_model = MBTIAnswer if session.kind == "mbti" else OCEANAnswer
+    return store_result(session.kind, [answer_model(**a) for a in session_manager.answers(session)], result)
+
+@app.post("/predict/mbti/batch")
+async def predict_mbti_batch(answer_sets: List[List[MBTIAnswer]]) -> List[MBTIBatchItem]:
+    """Predict MBTI types for many answer sets in one vectorized pass"""
+    require_model(mbti_model, "MBTI")
+    
+    try:
+        outcomes = await run_inference(
+            "question_generator", "score_mbti_answer_sets",
+            [[a.answer for a in answers] for answers in answer_sets],
+            [[a.question_id for a in answers] for answers in answer_sets]
+        )
+        
+        items = []
+        for i, (result, error) in enumerate(outcomes):
+            item = MBTIBatchItem(index=i, error=error)
+            if result is not None:
+                mbti_type, breakdown, confidence = result
+                item.result = store_result("mbti", answer_sets[i], MBTIResult(mbti_type=mbti_type, confidence=confidence, breakdown=breakdown))
+            items.append(item)
+        
+        return items
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error predicting MBTI batch: {str(e)}")
+
+@app.post("/predict/ocean/batch")
+async def predict_ocean_batch(answer_sets: List[List[OCEANAnswer]]) -> List[OCEANBatchItem]:
+    """Predict OCEAN scores for many answer sets in one vectorized pass"""
+    require_model(ocean_model, "OCEAN")
+    
+    try:
+        outcomes = await run_inference(
+            "question_generator", "score_ocean_answer_sets",
+            [[a.answer for a in answers] for answers in answer_sets],
+            [[a.question_id for a in answers] for answers in answer_sets]
+        )
+        
+        items = []
+        for i, (scores, error) in enumerate(outcomes):
+            item = OCEANBatchItem(index=i, error=error)
+            if scores is not None:
+                item.result = store_result("ocean", answer_sets[i], OCEANResult(scores=scores, interpretation=interpret_ocean_scores(scores)))
+            items.append(item)
+        
+        return items
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error predicting OCEAN batch: {str(e)}")
+
+@app.get("/results/{result_id}")
+async def get_result(result_id: str) -> StoredResult:
+    """Get a stored assessment result with its answers"""
+    record = await result_store.get(result_id) if result_store is not None else None
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Unknown result: {result_id}")
+    return StoredResult(result_id=record["id"], **{k: v for k, v in record.items() if k != "id"})
+
+@app.get("/models")
+async def get_model_versions():
+    """Published model versions with their training metrics, and the version being served"""
     return {
-        "types": [
-            {"code": "INTJ", "name": "The Architect", "description": "Imaginative and strategic thinkers"},
-            {"code": "INTP", "name": "The Thinker", "description": "Innovative inventors with an unquenchable thirst for knowledge"},
-            {"code": "ENTJ", "name": "The Commander", "description": "Bold, imaginative and strong-willed leaders"},
-            {"code": "ENTP", "name": "The Debater", "description": "Smart and curious thinkers who cannot resist an intellectual challenge"},
-            {"code": "INFJ", "name": "The Advocate", "description": "Creative and insightful, inspired by their own values"},
-            {"code": "INFP", "name": "The Mediator", "description": "Poetic, kind and altruistic people"},
-            {"code": "ENFJ", "name": "The Protagonist", "description": "Charismatic and inspiring leaders"},
-            {"code": "ENFP", "name": "The Campaigner", "description": "Enthusiastic, creative and sociable free spirits"},
-            {"code": "ISTJ", "name": "The Logistician", "description": "Practical and fact-minded, reliable"},
-            {"code": "ISFJ", "name": "The Protector", "description": "Very dedicated and warm protectors"},
-            {"code": "ESTJ", "name": "The Executive", "description": "Excellent administrators, unsurpassed at managing things"},
-            {"code": "ESFJ", "name": "The Consul", "description": "Extraordinarily caring, social and popular"},
-            {"code": "ISTP", "name": "The Virtuoso", "description": "Bold and practical experimenters"},
-            {"code": "ISFP", "name": "The Adventurer", "description": "Flexible and charming artists"},
-            {"code": "ESTP", "name": "The Entrepreneur", "description": "Smart, energetic and very perceptive people"},
-            {"code": "ESFP", "name": "The Entertainer", "description": "Spontaneous, energetic and enthusiastic people"}
-        ]
+        "active_version": model_registry.active_version(),
+        "serving_version": active_model_version,
+        "versions": model_registry.versions()
     }
 
+@app.post("/models/{version}/activate")
+async def activate_model_version(version: str):
+    """Serve a published model version; other workers switch within MODEL_WATCH_INTERVAL"""
+    try:
+        model_registry.activate(version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    try:
+        await reload_active_models()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading model version {version}: {str(e)}")
+    return {"active_version": version, "serving_version": active_model_version}
+
+@app.post("/models/rollback")
+async def rollback_model_version():
+    """Serve the model version published before the active one"""
+    try:
+        version = model_registry.rollback()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    try:
+        await reload_active_models()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading model version {version}: {str(e)}")
+    return {"active_version": version, "serving_version": active_model_version}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Request, stage, model and training metrics in the Prometheus text format"""
+    INFERENCE_PENDING.set(inference.pending)
+    PREDICT_BATCH_SIZE.set(mbti_batcher.stats()["mean_batch_size"], "mbti")
+    PREDICT_BATCH_SIZE.set(ocean_batcher.stats()["mean_batch_size"], "ocean")
+    if result_store is not None:
+        RESULT_BACKLOG.set(len(result_store.pending))
+    SESSIONS_ACTIVE.set(len(session_manager.sessions))
+    MODELS_LOADED.set(int(mbti_model is not None), "mbti")
+    MODELS_LOADED.set(int(ocean_model is not None), "ocean")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/inference")
+async def get_inference_metrics():
+    """Queue depth and wait time of the inference executor, plus request coalescing"""
+    stats = inference.stats()
+    stats["batching"] = {"mbti": mbti_batcher.stats(), "ocean": ocean_batcher.stats()}
+    return stats
+
+@app.get("/metrics/results")
+async def get_result_store_metrics():
+    """Backlog and flush latency of the result store"""
+    if result_store is None:
+        return {"enabled": False}
+    return {"enabled": True, **result_store.stats()}
+
+@app.get("/metrics/sessions")
+async def get_session_metrics():
+    """Active assessment sessions and how sessions ended"""
+    return session_manager.stats()
+
+@app.get("/mbti-types")
+async def get_mbti_types(request: Request):
+    """Get information about MBTI types"""
+    cached = response_cache.get(question_generator.bank_version, "mbti-types", lambda: CachedResponse(
+        json.dumps({"types": MBTI_TYPE_INFO}, separators=(",", ":")).encode(), f"public, max-age={CATALOG_MAX_AGE}"
+    ))
+    return cached.respond(request.headers.get("if-none-match"))
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,94 @@
+import asyncio
+import collections
+
+class MicroBatcher:
+    """Coalesces concurrent single-item requests into one batch call
+
+    `process_batch` is an async callable taking a list of items and returning
+    one result per item, in order; a result that is an Exception instance is
+    raised to that item's caller only.
+
+    While fewer than `max_in_flight` batches are running, a request is
+    dispatched at once, so an idle server adds no latency. Once every slot is
+    busy, requests queue up and go out together when a slot frees up, the
+    queue reaches `max_batch_size`, or `max_wait` seconds have passed.
+    """
+
+    def __init__(self, process_batch, max_batch_size=64, max_wait=0.002, max_in_flight=1):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_in_flight = max_in_flight
+        self.queue = collections.deque()
+        self.in_flight = 0
+        # Running batch tasks, referenced until done so they are not garbage collected
+        self.tasks = set()
+        self.timer = None
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item):
+        """Queue one item and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.append((item, future))
+
+        if self.in_flight < self.max_in_flight or len(self.queue) >= self.max_batch_size:
+            self._flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Dispatch up to max_batch_size queued items as one batch"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.queue:
+            return
+
+        batch = [self.queue.popleft() for _ in range(min(len(self.queue), self.max_batch_size))]
+        self.in_flight += 1
+        self.batches += 1
+        self.items += len(batch)
+        task = asyncio.ensure_future(self._run(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+        if self.queue and self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+
+    async def _run(self, batch):
+        try:
+            results = await self.process_batch([item for item, _ in batch])
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.in_flight -= 1
+            if self.queue:
+                self._flush()
+
+    async def close(self):
+        """Dispatch every queued item and wait for all batches to finish"""
+        while self.queue or self.tasks:
+            self._flush()
+            if self.tasks:
+                await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "batches_total": self.batches,
+            "items_total": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "queued": len(self.queue),
+            "in_flight": self.in_flight
+        }
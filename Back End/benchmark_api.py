@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Load test for the question and prediction endpoints
+
+Measures throughput and latency percentiles per endpoint at one or more
+concurrency levels, either in-process against the ASGI app (no server or
+network needed) or against a running server:
+
+    python benchmark_api.py --concurrency 1 16 64
+    python benchmark_api.py --url http://localhost:8000 --requests 5000
+    python benchmark_api.py --save-baseline api_baseline.json
+    python benchmark_api.py --baseline api_baseline.json --tolerance 0.25
+
+Each measurement is repeated --repeats times and reported as the median of
+the runs. With --baseline the run is compared against a previously saved run
+and exits with status 1 if any endpoint's median throughput fell, or its
+median p50 latency rose, by more than the tolerance, or it returned more
+errors. Tail latencies are reported but not gated: a single run's p99 varies
+too much from run to run. The tolerance is widened to twice the spread seen
+between repeats when that is larger, so noisy hosts do not fail the check.
+The default of 25% is meant for comparing runs on the same otherwise idle
+host; across machines only large regressions are meaningful.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import httpx
+import numpy as np
+from benchmark_baseline import add_baseline_arguments, finish
+
+SCENARIOS = ["questions_mbti", "questions_ocean", "predict_mbti", "predict_ocean"]
+
+# Answer sets generated per prediction scenario, cycled through by the workers
+PAYLOAD_POOL_SIZE = 256
+
+# Statistics compared against a baseline, and whether higher values are better
+GATED_STATISTICS = {"rps": True, "p50_ms": False}
+
+async def build_requests(client, seed):
+    """Request (method, path, json) lists per scenario, with answers to the full question banks"""
+    rng = random.Random(seed)
+    mbti_bank = (await client.get("/questions/mbti", params={"num_questions": 1000})).json()
+    ocean_bank = (await client.get("/questions/ocean", params={"num_questions": 1000})).json()
+
+    return {
+        "questions_mbti": [("GET", "/questions/mbti?num_questions=20", None)],
+        "questions_ocean": [("GET", "/questions/ocean?num_questions=40", None)],
+        "predict_mbti": [
+            ("POST", "/predict/mbti", [{"question_id": q["id"], "answer": rng.choice(q["options"])} for q in mbti_bank])
+            for _ in range(PAYLOAD_POOL_SIZE)
+        ],
+        "predict_ocean": [
+            ("POST", "/predict/ocean", [{"question_id": q["id"], "answer": rng.randint(1, 5)} for q in ocean_bank])
+            for _ in range(PAYLOAD_POOL_SIZE)
+        ]
+    }
+
+async def run_load(client, requests, total, concurrency):
+    """Send `total` requests from `concurrency` workers; return latencies, errors and elapsed time"""
+    latencies = []
+    errors = 0
+    sent = 0
+
+    async def worker():
+        nonlocal errors, sent
+        while sent < total:
+            method, path, body = requests[sent % len(requests)]
+            sent += 1
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+def summarize(latencies, errors, elapsed):
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "max_ms": float(latencies_ms.max())
+    }
+
+def combine(runs):
+    """Median of each statistic over repeated runs, plus the relative spread of the gated ones"""
+    combined = {key: float(np.median([run[key] for run in runs])) for key in runs[0]}
+    combined["requests"] = runs[0]["requests"]
+    combined["errors"] = sum(run["errors"] for run in runs)
+    for key in GATED_STATISTICS:
+        values = [run[key] for run in runs]
+        combined[f"{key}_spread"] = (max(values) - min(values)) / combined[key] if combined[key] else 0.0
+    return combined
+
+async def benchmark(client, scenarios, concurrencies, total, warmup, repeats, seed):
+    requests_by_scenario = await build_requests(client, seed)
+    results = {}
+    for scenario in scenarios:
+        for concurrency in concurrencies:
+            requests = requests_by_scenario[scenario]
+            await run_load(client, requests, warmup, concurrency)
+            runs = [summarize(*await run_load(client, requests, total, concurrency)) for _ in range(repeats)]
+            results[f"{scenario}@{concurrency}"] = combine(runs)
+    return results
+
+async def benchmark_in_process(*args):
+    """Benchmark the ASGI app in this process, with the app's startup and shutdown handlers"""
+    # Keep benchmark results out of the real result store
+    os.environ.setdefault("RESULT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "results.db"))
+    import api
+
+    async with api.app.router.lifespan_context(api.app):
+        if api.model_load_task is not None:
+            await api.model_load_task
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            return await benchmark(client, *args)
+
+async def benchmark_server(url, *args):
+    """Benchmark a running server over HTTP"""
+    concurrency = max(args[1])
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        return await benchmark(client, *args)
+
+def error_regressions(results, baseline):
+    """Endpoints that returned more errors than in the baseline"""
+    return [
+        f"{name}: {result['errors']} errors, baseline {baseline['results'][name]['errors']}"
+        for name, result in results.items()
+        if name in baseline["results"] and result["errors"] > baseline["results"][name]["errors"]
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the question and prediction endpoints")
+    parser.add_argument("--url", help="benchmark a running server instead of the app in-process")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 16, 64], help="concurrent clients, one run per level")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=200, help="requests sent before each measurement")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per measurement; the median run is reported")
+    parser.add_argument("--seed", type=int, default=42)
+    add_baseline_arguments(parser, "allowed relative regression of median throughput and p50 against the baseline")
+    args = parser.parse_args()
+
+    load_args = (args.scenarios, args.concurrency, args.requests, args.warmup, args.repeats, args.seed)
+    if args.url:
+        results = asyncio.run(benchmark_server(args.url, *load_args))
+    else:
+        results = asyncio.run(benchmark_in_process(*load_args))
+
+    print(f"{'endpoint':<24} {'requests':>8} {'errors':>6} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, r in results.items():
+        print(f"{name:<24} {r['requests']:>8} {r['errors']:>6} {r['rps']:>9.0f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+
+    finish(
+        args, results, GATED_STATISTICS, error_regressions,
+        target=args.url or "in-process", requests=args.requests, repeats=args.repeats
+    )
+
+if __name__ == "__main__":
+    main()
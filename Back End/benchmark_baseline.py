@@ -0,0 +1,82 @@
+"""
+Saving and comparing benchmark baselines
+
+Shared by benchmark_api.py and benchmark_hotpaths.py. A run is saved as JSON
+with the host it ran on, and a later run is compared statistic by statistic
+against it; the scripts exit with status 1 when anything regressed beyond the
+tolerance.
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+
+# The allowed regression is at least this many times the relative spread a
+# statistic showed between repeated runs, so noisy hosts do not fail the check
+NOISE_FACTOR = 2.0
+
+def add_baseline_arguments(parser, tolerance_help="allowed relative regression against the baseline"):
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help=tolerance_help)
+
+def compare(results, baseline, tolerance, statistics):
+    """Lines describing regressions against a baseline run, empty when there are none
+
+    `statistics` maps each compared statistic to whether higher values are
+    better. A statistic regressed when it is worse than the baseline by more
+    than a factor of 1 + tolerance. A result's optional `<statistic>_spread` is
+    the statistic's relative spread across repeated runs and widens that
+    allowance to 1 + NOISE_FACTOR * spread when larger.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        for key, higher_is_better in statistics.items():
+            noise = NOISE_FACTOR * max(result.get(f"{key}_spread", 0.0), previous.get(f"{key}_spread", 0.0))
+            allowed = max(tolerance, noise)
+            if higher_is_better:
+                # Fell by a factor of more than 1 + allowed, so a wide allowance
+                # still catches large drops
+                regressed = result[key] * (1 + allowed) < previous[key]
+            else:
+                regressed = result[key] > previous[key] * (1 + allowed)
+            if regressed:
+                regressions.append(f"{name}: {key} {result[key]:.4g}, baseline {previous[key]:.4g}, allowed {allowed:.0%}")
+    return regressions
+
+def finish(args, results, statistics, extra_checks=None, **details):
+    """Save the run and compare it against a baseline as the command line asks
+
+    `extra_checks(results, baseline)` may return further regression lines.
+    Exits with status 1 when there are regressions.
+    """
+    if args.save_baseline:
+        run = {
+            "created_at": time.time(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            **details,
+            "results": results
+        }
+        with open(args.save_baseline, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, statistics)
+        if extra_checks is not None:
+            regressions += extra_checks(results, baseline)
+        if regressions:
+            print(f"Regressions beyond {args.tolerance:.0%} of the baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of the baseline")
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the scoring, inference and training hot paths
+
+Times calculate_mbti_score, calculate_ocean_scores and their batch
+score_*_answer_sets paths, MBTIModel.predict_proba, OCEANModel.predict and
+both models' train on the synthetic data of DatasetLoader.create_sample_*,
+sweeping batch size, tree count and feature count:
+
+    python benchmark_hotpaths.py
+    python benchmark_hotpaths.py --groups inference --batch-sizes 1 1000 100000
+    python benchmark_hotpaths.py --groups training --train-sizes 1000 10000 --trees 10 100
+    python benchmark_hotpaths.py --save-baseline hotpaths_baseline.json
+    python benchmark_hotpaths.py --baseline hotpaths_baseline.json --tolerance 0.25
+
+Each case is run once to warm up (except training), then repeatedly until it
+has run for --min-time seconds and at least --min-rounds times; the min,
+median, mean and standard deviation of those rounds are reported. Peak memory
+comes from one extra run under tracemalloc, which sees Python and NumPy
+allocations but not memory allocated inside scikit-learn's tree builders or in
+OCEAN training worker processes.
+
+With --baseline the run is compared against a previously saved run and exits
+with status 1 if any case's median time or peak memory rose by more than the
+tolerance, or by more than twice the interquartile range of its rounds for
+noisy cases.
+"""
+
+import argparse
+import contextlib
+import functools
+import io
+import time
+import tracemalloc
+import numpy as np
+from benchmark_baseline import add_baseline_arguments, finish
+from data_loader import DatasetLoader
+from models import MBTIModel, OCEANModel
+from question_generator import QuestionGenerator
+
+GROUPS = ["scoring", "inference", "training"]
+
+# Statistics compared against a baseline, and whether higher values are better
+GATED_STATISTICS = {"median_s": False, "peak_bytes": False}
+
+@functools.lru_cache(maxsize=None)
+def sample_dataset(kind, rows, features, seed):
+    """Synthetic (X, y) with `features` columns
+
+    Columns past the dataset's own questions are extra random 1-5 answers;
+    fewer features keep the first columns.
+    """
+    loader = DatasetLoader()
+    if kind == "mbti":
+        X, y, _ = loader.preprocess_mbti_data(loader.create_sample_mbti_dataset(rows, seed))
+    else:
+        X, y, _, _ = loader.preprocess_ocean_data(loader.create_sample_ocean_dataset(rows, seed))
+    if features is None or features == X.shape[1]:
+        return X, y
+    if features < X.shape[1]:
+        return X[:, :features], y
+    extra = np.random.RandomState(seed + 1).randint(1, 6, (rows, features - X.shape[1]))
+    return np.hstack([X, extra]), y
+
+@functools.lru_cache(maxsize=None)
+def native_features(kind):
+    """Number of questions in the synthetic dataset"""
+    return sample_dataset(kind, 1, None, 0)[0].shape[1]
+
+def answer_sets(question_generator, kind, rows, seed):
+    """The synthetic responses as API answer sets for the first questions of the bank"""
+    X, _ = sample_dataset(kind, rows, None, seed)
+    if kind == "mbti":
+        bank = question_generator.mbti_questions[:X.shape[1]]
+        answers = [[q["options"][(r - 1) % len(q["options"])] for q, r in zip(bank, row)] for row in X.tolist()]
+    else:
+        bank = question_generator.ocean_questions[:X.shape[1]]
+        answers = X.tolist()
+    question_ids = [q["id"] for q in bank]
+    return answers, [question_ids] * rows
+
+def create_model(kind, trees, n_jobs):
+    options = {"n_estimators": trees}
+    if n_jobs is not None:
+        options["n_jobs"] = n_jobs
+    return MBTIModel(**options) if kind == "mbti" else OCEANModel(**options)
+
+def train_quietly(model, X, y):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return model.train(X, y)
+
+@functools.lru_cache(maxsize=None)
+def trained_model(kind, trees, features, train_rows, seed, n_jobs):
+    X, y = sample_dataset(kind, train_rows, features, seed)
+    model = create_model(kind, trees, n_jobs)
+    train_quietly(model, X, y)
+    return model
+
+def scoring_cases(args, question_generator):
+    """(name, params, setup) for both scoring paths, one call per respondent and one per batch"""
+    for rows in args.batch_sizes:
+        for kind, calculate, score_batch in (
+            ("mbti", question_generator.calculate_mbti_score, question_generator.score_mbti_answer_sets),
+            ("ocean", question_generator.calculate_ocean_scores, question_generator.score_ocean_answer_sets)
+        ):
+            def setup_each(kind=kind, rows=rows, calculate=calculate):
+                answers, question_ids = answer_sets(question_generator, kind, rows, args.seed)
+                return lambda: [calculate(a, q) for a, q in zip(answers, question_ids)]
+
+            def setup_batch(kind=kind, rows=rows, score_batch=score_batch):
+                answers, question_ids = answer_sets(question_generator, kind, rows, args.seed)
+                return lambda: score_batch(answers, question_ids)
+
+            name = "calculate_mbti_score" if kind == "mbti" else "calculate_ocean_scores"
+            yield name, {"rows": rows}, setup_each
+            yield f"score_{kind}_answer_sets", {"rows": rows}, setup_batch
+
+def inference_cases(args):
+    """(name, params, setup) for prediction over batch sizes, then tree and feature counts at --sweep-rows"""
+    sweeps = [(rows, args.default_trees, None) for rows in args.batch_sizes]
+    sweeps += [(args.sweep_rows, trees, None) for trees in args.trees if trees != args.default_trees]
+    sweeps += [(args.sweep_rows, args.default_trees, features) for features in args.features]
+    for rows, trees, features in sweeps:
+        for kind, name in (("mbti", "MBTIModel.predict_proba"), ("ocean", "OCEANModel.predict")):
+            def setup(kind=kind, rows=rows, trees=trees, features=features):
+                model = trained_model(kind, trees, features, args.model_train_rows, args.seed, args.n_jobs)
+                X, _ = sample_dataset(kind, rows, features, args.seed + 2)
+                predict = model.predict_proba if kind == "mbti" else model.predict
+                return lambda: predict(X)
+
+            params = {"rows": rows, "trees": trees, "features": features or native_features(kind)}
+            yield name, params, setup
+
+def training_cases(args):
+    """(name, params, setup) for training over dataset sizes, then tree and feature counts at --sweep-train-rows"""
+    sweeps = [(rows, args.default_trees, None) for rows in args.train_sizes]
+    sweeps += [(args.sweep_train_rows, trees, None) for trees in args.trees if trees != args.default_trees]
+    sweeps += [(args.sweep_train_rows, args.default_trees, features) for features in args.features]
+    for rows, trees, features in sweeps:
+        for kind, name in (("mbti", "MBTIModel.train"), ("ocean", "OCEANModel.train")):
+            def setup(kind=kind, rows=rows, trees=trees, features=features):
+                X, y = sample_dataset(kind, rows, features, args.seed)
+                return lambda: train_quietly(create_model(kind, trees, args.n_jobs), X, y)
+
+            params = {"rows": rows, "trees": trees, "features": features or native_features(kind)}
+            yield name, params, setup
+
+def measure(function, min_time, min_rounds, max_rounds, warmup=True):
+    """Timing statistics over repeated calls, plus the peak memory of one traced call"""
+    if warmup:
+        function()
+    timings = []
+    elapsed = 0.0
+    while len(timings) < min_rounds or (elapsed < min_time and len(timings) < max_rounds):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+        elapsed += timings[-1]
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings = np.array(timings)
+    quartile_1, median, quartile_3 = np.percentile(timings, [25, 50, 75])
+    return {
+        "rounds": len(timings),
+        "min_s": float(timings.min()),
+        "median_s": float(median),
+        "mean_s": float(timings.mean()),
+        "stddev_s": float(timings.std()),
+        # Interquartile range relative to the median, which widens the allowed
+        # regression for noisy cases
+        "median_s_spread": float((quartile_3 - quartile_1) / median),
+        "peak_bytes": int(peak)
+    }
+
+def case_key(name, params):
+    return f"{name}[{','.join(f'{k}={v}' for k, v in params.items())}]"
+
+def run(args):
+    """Run every case of the selected groups, printing each result as it finishes"""
+    cases = []
+    if "scoring" in args.groups:
+        cases += [case + (True,) for case in scoring_cases(args, QuestionGenerator())]
+    if "inference" in args.groups:
+        cases += [case + (True,) for case in inference_cases(args)]
+    if "training" in args.groups:
+        # A training run is long enough that a warm-up would only double the time taken
+        cases += [case + (False,) for case in training_cases(args)]
+
+    print(f"{'case':<64} {'rounds':>6} {'min ms':>10} {'median ms':>10} {'stddev ms':>10} {'rows/s':>12} {'peak MiB':>9}")
+    results = {}
+    for name, params, setup, warmup in cases:
+        result = measure(setup(), args.min_time, args.min_rounds, args.max_rounds, warmup)
+        result["rows"] = params["rows"]
+        result["rows_per_second"] = params["rows"] / result["median_s"]
+        key = case_key(name, params)
+        results[key] = result
+        print(
+            f"{key:<64} {result['rounds']:>6} {result['min_s'] * 1000:>10.3f} {result['median_s'] * 1000:>10.3f} "
+            f"{result['stddev_s'] * 1000:>10.3f} {result['rows_per_second']:>12.0f} {result['peak_bytes'] / 2**20:>9.2f}",
+            flush=True
+        )
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark the scoring, inference and training hot paths")
+    parser.add_argument("--groups", nargs="+", choices=GROUPS, default=GROUPS)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 10, 100, 1000, 10_000, 100_000], help="rows per scoring and prediction call")
+    parser.add_argument("--train-sizes", nargs="+", type=int, default=[1000, 10_000], help="rows per training run")
+    parser.add_argument("--trees", nargs="+", type=int, default=[10, 50, 100], help="trees per forest for the tree count sweep")
+    parser.add_argument("--features", nargs="+", type=int, default=[16, 64, 256], help="feature counts for the feature count sweep")
+    parser.add_argument("--default-trees", type=int, default=100, help="trees per forest outside the tree count sweep")
+    parser.add_argument("--sweep-rows", type=int, default=1000, help="prediction batch size in the tree and feature sweeps")
+    parser.add_argument("--sweep-train-rows", type=int, default=5000, help="training rows in the tree and feature sweeps")
+    parser.add_argument("--model-train-rows", type=int, default=5000, help="rows the models benchmarked for inference are trained on")
+    parser.add_argument("--n-jobs", type=int, help="cores used to build forests, the models' default when omitted")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds each case is repeated for at least")
+    parser.add_argument("--min-rounds", type=int, default=3)
+    parser.add_argument("--max-rounds", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    add_baseline_arguments(parser, "allowed relative regression of median time and peak memory against the baseline")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    finish(args, results, GATED_STATISTICS, numpy=np.__version__)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import numpy as np
+
+# Rows evaluated per chunk are chosen so the (rows, trees, outputs) leaf value
+# block stays around this many elements and fits in cache
+CHUNK_ELEMENTS = 1 << 18
+
+# Traversal steps between dropping (sample, tree) pairs that reached a leaf
+COMPACT_EVERY = 4
+
+class CompiledForest:
+    """Trained sklearn forests flattened into contiguous NumPy node arrays
+
+    All trees of all forests share one set of node arrays, so a single
+    vectorized traversal evaluates every tree for a whole batch. Each node's
+    row of `value` holds only its own forest's outputs; forest k owns trees
+    tree_starts[k]:tree_starts[k + 1] and output columns
+    column_starts[k]:column_starts[k + 1]. Tree sums are accumulated in
+    estimator order so results are bit-identical to sklearn's
+    predict/predict_proba.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, n_estimators, n_features, max_depth,
+                 classes=None, tree_starts=None, column_starts=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.n_estimators = n_estimators
+        self.n_features = n_features
+        self.max_depth = max_depth
+        self.classes = classes
+        # By default every tree writes every output column
+        self.tree_starts = np.array([0, len(roots)]) if tree_starts is None else tree_starts
+        self.column_starts = np.array([0, value.shape[1]]) if column_starts is None else column_starts
+
+    def __setstate__(self, state):
+        # joblib hands memory-mapped arrays back as np.memmap; plain ndarray
+        # views over the same pages avoid the subclass overhead on every index
+        self.__dict__.update({
+            name: np.asarray(value) if isinstance(value, np.memmap) else value
+            for name, value in state.items()
+        })
+        # Artifacts saved before per-forest columns pad every tree to all
+        # columns, which sums the same as one forest writing all of them
+        if "tree_starts" not in state:
+            self.tree_starts = np.array([0, len(self.roots)])
+            self.column_starts = np.array([0, self.value.shape[1]])
+
+    @classmethod
+    def from_forests(cls, forests):
+        """Compile fitted RandomForestClassifier/RandomForestRegressor instances
+
+        A classifier compiles to one column per class; regressors compile to one
+        column per output, with the columns of several forests laid side by side.
+        """
+        # Imported here so loading a compiled forest does not import scikit-learn
+        import sklearn
+        from sklearn.utils.fixes import parse_version
+        
+        # Up to scikit-learn 1.3 classifier trees store weighted class counts in
+        # their leaves and normalise them at predict time; later versions store fractions
+        normalize_class_counts = parse_version(sklearn.__version__) < parse_version("1.4")
+        
+        is_classifier = hasattr(forests[0], "classes_")
+        if is_classifier and (len(forests) > 1 or forests[0].n_outputs_ > 1):
+            raise ValueError("Only a single single-output classifier forest can be compiled")
+
+        column_counts = [len(f.classes_) if is_classifier else f.n_outputs_ for f in forests]
+        column_starts = np.cumsum([0] + column_counts)
+        tree_starts = np.cumsum([0] + [len(f.estimators_) for f in forests])
+        width = max(column_counts)
+        features, thresholds, children, values, roots = [], [], [], [], []
+        n_estimators = np.zeros(column_starts[-1])
+        offset = 0
+
+        for forest, start, count in zip(forests, column_starts, column_counts):
+            n_estimators[start:start + count] = len(forest.estimators_)
+            for estimator in forest.estimators_:
+                tree = estimator.tree_
+                node_ids = np.arange(tree.node_count)
+                is_leaf = tree.children_left == -1
+
+                # Children are interleaved as [left, right] per node, and leaves
+                # point at themselves so extra traversal steps are no-ops
+                features.append(np.where(is_leaf, 0, tree.feature))
+                thresholds.append(tree.threshold)
+                children.append(np.column_stack([
+                    np.where(is_leaf, node_ids, tree.children_left),
+                    np.where(is_leaf, node_ids, tree.children_right)
+                ]).ravel() + offset)
+
+                leaf_value = tree.value[:, 0, :] if is_classifier else tree.value[:, :, 0]
+                if is_classifier and normalize_class_counts:
+                    normalizer = leaf_value.sum(axis=1)[:, np.newaxis]
+                    normalizer[normalizer == 0.0] = 1.0
+                    leaf_value = leaf_value / normalizer
+                if count < width:
+                    leaf_value = np.pad(leaf_value, ((0, 0), (0, width - count)))
+                values.append(leaf_value)
+
+                roots.append(offset)
+                offset += tree.node_count
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            children=np.ascontiguousarray(np.concatenate(children), dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.array(roots, dtype=np.intp),
+            n_estimators=n_estimators,
+            n_features=forests[0].n_features_in_,
+            max_depth=max(e.tree_.max_depth for f in forests for e in f.estimators_),
+            classes=forests[0].classes_ if is_classifier else None,
+            tree_starts=tree_starts,
+            column_starts=column_starts
+        )
+
+    def apply(self, X):
+        """Return the leaf reached in every tree, shape (n_samples, n_trees)"""
+        X = self._validate(X)
+        X_flat = X.ravel()
+        leaves = np.repeat(self.roots[np.newaxis, :], len(X), axis=0).ravel()
+        # (sample, tree) pairs still descending, as flat positions into leaves
+        active = np.arange(leaves.size)
+        nodes = leaves.copy()
+        row_starts = np.repeat(np.arange(len(X)) * self.n_features, len(self.roots))
+
+        for depth in range(self.max_depth):
+            go_right = ~(X_flat[row_starts + self.feature[nodes]] <= self.threshold[nodes])
+            nodes = self.children[2 * nodes + go_right]
+            if depth % COMPACT_EVERY == COMPACT_EVERY - 1:
+                # Drop pairs that reached their leaf, so deep trees do not keep
+                # re-walking the shallow leaves of every other tree
+                leaves[active] = nodes
+                descending = self.children[2 * nodes] != nodes
+                active, nodes, row_starts = active[descending], nodes[descending], row_starts[descending]
+                if not active.size:
+                    break
+
+        leaves[active] = nodes
+        return leaves.reshape(len(X), len(self.roots))
+
+    def predict_values(self, X):
+        """Average the leaf values of every forest, shape (n_samples, n_columns)"""
+        X = self._validate(X)
+        sums = np.empty((len(X), self.column_starts[-1]))
+        chunk_size = max(1, CHUNK_ELEMENTS // (len(self.roots) * self.value.shape[1]))
+        forests = list(zip(self.tree_starts[:-1], self.tree_starts[1:], self.column_starts[:-1], self.column_starts[1:]))
+
+        for start in range(0, len(X), chunk_size):
+            leaves = self.apply(X[start:start + chunk_size])
+            for first_tree, end_tree, first_column, end_column in forests:
+                leaf_values = self.value[leaves[:, first_tree:end_tree], :end_column - first_column]
+                # cumsum adds the trees strictly in order, matching sklearn's accumulation
+                sums[start:start + chunk_size, first_column:end_column] = np.cumsum(leaf_values, axis=1)[:, -1]
+
+        return sums / self.n_estimators
+
+    def predict_proba(self, X):
+        """Predict class probabilities like RandomForestClassifier.predict_proba"""
+        return self.predict_values(X)
+
+    def predict(self, X):
+        """Predict classes, or regression outputs for regressor forests"""
+        values = self.predict_values(X)
+        if self.classes is not None:
+            return self.classes.take(np.argmax(values, axis=1), axis=0)
+        return values
+
+    def _validate(self, X):
+        """Convert X to float32 like sklearn's tree input validation"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (n_samples, {self.n_features}), got {X.shape}")
+        return X
@@ -1,4 +1,5 @@
 import os
+import secrets
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,3 +15,82 @@ OCEAN_DATASET = "tunguz/big-five-personality-test"
 # Model configurations
 MODEL_SAVE_PATH = "models"
 DATA_PATH = "data"
+
+# Preprocessed dataset arrays, keyed by dataset and CSV checksum, so retraining
+# skips the download and CSV parsing. Cached arrays are memory-mapped ("r");
+# set DATASET_CACHE_MMAP_MODE to an empty string to read them fully
+DATASET_CACHE_PATH = os.getenv("DATASET_CACHE_PATH", os.path.join(DATA_PATH, "cache"))
+DATASET_CACHE_MMAP_MODE = os.getenv("DATASET_CACHE_MMAP_MODE", "r") or None
+
+# Training parallelism: cores used to build each forest (-1 for all cores) and
+# worker processes used to fit independent models concurrently
+TRAIN_N_JOBS = int(os.getenv("TRAIN_N_JOBS", "-1"))
+TRAIN_PROCESSES = int(os.getenv("TRAIN_PROCESSES", "1"))
+
+# Finished /train-models jobs kept for GET /train-models/{job_id}; older ones
+# are forgotten when a new job starts
+TRAINING_JOBS_KEPT = int(os.getenv("TRAINING_JOBS_KEPT", "50"))
+
+# Memory-map compiled model arrays when serving ("r"), so API workers share one
+# page-cache copy; set to an empty string to load models fully into memory
+MODEL_MMAP_MODE = os.getenv("MODEL_MMAP_MODE", "r") or None
+
+# Load saved models in the background once the API is up, so /health answers
+# immediately; predictions get a 503 with Retry-After until they are loaded
+MODEL_BACKGROUND_LOAD = os.getenv("MODEL_BACKGROUND_LOAD", "1") == "1"
+
+# Load models while api.py is imported instead; set by the production launcher
+# so a pre-forking server loads them once, before forking its workers
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "0") == "1"
+
+# Seconds between checks of the model registry's active version; API workers
+# load and swap in a newly activated version in the background (0 disables)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "2"))
+
+# Seconds clients and proxies may reuse static catalog responses such as
+# /mbti-types before revalidating them with their ETag
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "3600"))
+
+# Key signing the question tokens issued by /questions/*. Set the same value on
+# every API host and worker, otherwise a token only verifies in the process
+# that issued it; start_backend.py shares one generated key between its workers
+QUESTION_TOKEN_SECRET = os.getenv("QUESTION_TOKEN_SECRET") or secrets.token_hex(32)
+
+# Adaptive assessments (/adaptive/*) stop once every MBTI letter is this likely
+# to be right and every OCEAN trait score has at most this standard error, or
+# after ADAPTIVE_MAX_QUESTIONS answers (0 allows the whole question bank)
+ADAPTIVE_MBTI_CONFIDENCE = float(os.getenv("ADAPTIVE_MBTI_CONFIDENCE", "0.9"))
+ADAPTIVE_OCEAN_MAX_STANDARD_ERROR = float(os.getenv("ADAPTIVE_OCEAN_MAX_STANDARD_ERROR", "0.35"))
+ADAPTIVE_MAX_QUESTIONS = int(os.getenv("ADAPTIVE_MAX_QUESTIONS", "0"))
+
+# Assessment results are buffered in memory and written to RESULT_STORE
+# ("sqlite", or "none" to not store them) in one transaction per
+# RESULT_FLUSH_SIZE results, at least every RESULT_FLUSH_INTERVAL seconds.
+# Beyond RESULT_MAX_BACKLOG unwritten results the oldest are dropped
+RESULT_STORE = os.getenv("RESULT_STORE", "sqlite")
+RESULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", os.path.join(DATA_PATH, "results.db"))
+RESULT_FLUSH_SIZE = int(os.getenv("RESULT_FLUSH_SIZE", "500"))
+RESULT_FLUSH_INTERVAL = float(os.getenv("RESULT_FLUSH_INTERVAL", "1.0"))
+RESULT_MAX_BACKLOG = int(os.getenv("RESULT_MAX_BACKLOG", "100000"))
+
+# Assessment sessions (/sessions/*) live in the memory of the API worker that
+# created them and expire SESSION_TTL seconds after their last request; beyond
+# SESSION_MAX sessions the least recently used one is dropped
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "100000"))
+SESSION_EVICT_INTERVAL = float(os.getenv("SESSION_EVICT_INTERVAL", "60"))
+
+# Executor for CPU-bound inference calls: "thread", or "process" to run them in
+# worker processes that each load the models. Calls beyond INFERENCE_MAX_PENDING
+# are rejected with a 503 and Retry-After
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "256"))
+INFERENCE_RETRY_AFTER = int(os.getenv("INFERENCE_RETRY_AFTER", "1"))
+
+# Coalesce concurrent single-answer-set predictions into one vectorized call
+# once every inference worker is busy: a batch goes out when a worker frees up,
+# PREDICT_BATCH_MAX_SIZE sets are queued or PREDICT_BATCH_WINDOW_MS has passed
+PREDICT_BATCHING = os.getenv("PREDICT_BATCHING", "1") == "1"
+PREDICT_BATCH_MAX_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "64"))
+PREDICT_BATCH_WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", "2"))
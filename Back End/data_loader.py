@@ -1,13 +1,60 @@
+import hashlib
+import json
 import os
+import shutil
+import tempfile
 import pandas as pd
 import numpy as np
-from kaggle.api.kaggle_api_extended import KaggleApi
-from config import KAGGLE_USERNAME, KAGGLE_KEY, MBTI_DATASET, OCEAN_DATASET, DATA_PATH
+from config import (
+    KAGGLE_USERNAME, KAGGLE_KEY, MBTI_DATASET, OCEAN_DATASET, DATA_PATH,
+    DATASET_CACHE_PATH, DATASET_CACHE_MMAP_MODE
+)
+
+# Bump whenever preprocessing changes so stale cache entries are ignored
+DATASET_CACHE_VERSION = 2
+
+# Rows parsed per chunk when ingesting dataset CSVs
+CSV_CHUNK_ROWS = 50_000
+
+# The 16 MBTI types ordered so that letters E/I, S/N, T/F and J/P are the
+# bits 8, 4, 2 and 1 of a type's index (the first letter of each pair is 0)
+MBTI_TYPES = np.array([
+    e + s + t + j for e in "EI" for s in "SN" for t in "TF" for j in "JP"
+])
+
+# Sample OCEAN questionnaire scoring key, in O, C, E, A, N order: zero-based
+# indices of positively keyed and of reverse-keyed (6 - response) questions
+OCEAN_SCORING_KEY = [
+    ([5, 7, 9], [6, 8]),                                 # Openness (questions 6-10)
+    ([10, 11, 12, 13, 14, 15], [16, 17, 18, 19]),        # Conscientiousness (questions 11-20)
+    ([0, 1, 2, 3], [4]),                                 # Extraversion (questions 1-5)
+    ([20, 21, 22], [23, 24, 25]),                        # Agreeableness (questions 21-26)
+    ([26, 27, 28], [29])                                 # Neuroticism (questions 27-30)
+]
+
+def file_checksum(path, block_size=1 << 20):
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def count_lines(path, block_size=1 << 20):
+    """Number of newline characters in a file, read in blocks"""
+    with open(path, "rb") as f:
+        return sum(block.count(b"\n") for block in iter(lambda: f.read(block_size), b""))
 
 class DatasetLoader:
     def __init__(self):
-        self.api = KaggleApi()
-        self.setup_kaggle()
+        self._api = None
+    
+    @property
+    def api(self):
+        """Kaggle API client, set up on first use so loading cached data never touches Kaggle"""
+        if self._api is None:
+            self.setup_kaggle()
+        return self._api
         
     def setup_kaggle(self):
         """Setup Kaggle API credentials"""
@@ -17,55 +64,175 @@ class DatasetLoader:
                 f.write(f'{{"username":"{KAGGLE_USERNAME}","key":"{KAGGLE_KEY}"}}')
             os.chmod(os.path.expanduser("~/.kaggle/kaggle.json"), 0o600)
         
-        self.api.authenticate()
+        # Imported once the credentials are in place, since importing the
+        # kaggle package already authenticates
+        from kaggle.api.kaggle_api_extended import KaggleApi
+        api = KaggleApi()
+        api.authenticate()
+        self._api = api
     
-    def download_mbti_dataset(self):
+    def download_mbti_dataset(self, refresh=False):
         """Download and preprocess MBTI dataset"""
-        print("Downloading MBTI dataset...")
-        self.api.dataset_download_files(MBTI_DATASET, path=DATA_PATH, unzip=True)
+        return self.load_dataset(MBTI_DATASET, ['mbti', 'personality'], self.ingest_mbti_csv,
+                                 lambda: self.preprocess_mbti_data(self.create_sample_mbti_dataset()), refresh)
+    
+    def download_ocean_dataset(self, refresh=False):
+        """Download and preprocess OCEAN dataset"""
+        return self.load_dataset(OCEAN_DATASET, ['big5', 'ocean'], self.ingest_ocean_csv,
+                                 lambda: self.preprocess_ocean_data(self.create_sample_ocean_dataset()), refresh)
+    
+    def load_dataset(self, slug, name_patterns, ingest_csv, create_sample, refresh=False):
+        """Load a preprocessed dataset, downloading and parsing it only when needed
         
-        # Load the dataset
-        mbti_files = [f for f in os.listdir(DATA_PATH) if f.endswith('.csv')]
-        mbti_df = None
+        The Kaggle download is skipped when the dataset's CSV is already in
+        DATA_PATH, unless `refresh` is set, and parsing is skipped when the cache
+        holds arrays for that CSV. Without network access the most recent cache
+        entry for the dataset is used.
+        """
+        csv_path = None if refresh else self.find_dataset_file(name_patterns)
         
-        for file in mbti_files:
-            if 'mbti' in file.lower() or 'personality' in file.lower():
-                mbti_df = pd.read_csv(os.path.join(DATA_PATH, file))
-                break
+        if csv_path is None:
+            print(f"Downloading {slug} dataset...")
+            try:
+                self.api.dataset_download_files(slug, path=DATA_PATH, unzip=True)
+            except Exception as e:
+                cached = self.load_latest_cache(slug)
+                if cached is None:
+                    raise
+                print(f"Download failed ({str(e)}), using cached {slug} dataset")
+                return cached
+            csv_path = self.find_dataset_file(name_patterns)
         
-        if mbti_df is None:
-            # Create a sample MBTI dataset if download fails
-            print("Creating sample MBTI dataset...")
-            mbti_df = self.create_sample_mbti_dataset()
+        if csv_path is None:
+            # Create a sample dataset if download fails
+            print(f"Creating sample {slug} dataset...")
+            return create_sample()
         
-        return self.preprocess_mbti_data(mbti_df)
+        cache_dir = self.cache_dir(slug, file_checksum(csv_path))
+        cached = self.load_cache(cache_dir)
+        if cached is not None:
+            print(f"Using cached {slug} dataset")
+            return cached
+        
+        dataset = ingest_csv(csv_path)
+        self.save_cache(cache_dir, dataset)
+        return dataset
     
-    def download_ocean_dataset(self):
-        """Download and preprocess OCEAN dataset"""
-        print("Downloading OCEAN dataset...")
-        self.api.dataset_download_files(OCEAN_DATASET, path=DATA_PATH, unzip=True)
+    def ingest_mbti_csv(self, csv_path):
+        """Read an MBTI CSV into (X, y, feature_cols), like preprocess_mbti_data"""
+        X, y, feature_cols = self.ingest_csv(csv_path, ['type'], MBTI_TYPES.dtype, MBTI_TYPES)
+        return X, y[:, 0], feature_cols
+    
+    def ingest_ocean_csv(self, csv_path):
+        """Read an OCEAN CSV into (X, y, feature_cols, ocean_cols), like preprocess_ocean_data"""
+        ocean_cols = ['O', 'C', 'E', 'A', 'N']
+        X, y, feature_cols = self.ingest_csv(csv_path, ocean_cols, np.float64)
+        return X, y, feature_cols, ocean_cols
+    
+    def ingest_csv(self, csv_path, target_cols, target_dtype, target_values=None, chunk_rows=CSV_CHUNK_ROWS):
+        """Stream the q* answer columns and target columns of a CSV into compact arrays
         
-        # Load the dataset
-        ocean_files = [f for f in os.listdir(DATA_PATH) if f.endswith('.csv')]
-        ocean_df = None
+        The CSV is read in chunks of `chunk_rows` rows straight into preallocated
+        arrays, with answers stored as int8. Rows with a missing or out-of-range
+        (not 1-5) answer, or a missing target or one not in `target_values`, are
+        dropped. Returns (X, y, feature_cols), with one y column per target.
+        """
+        header = pd.read_csv(csv_path, nrows=0).columns
+        feature_cols = [col for col in header if col.startswith('q')]
         
-        for file in ocean_files:
-            if 'big5' in file.lower() or 'ocean' in file.lower():
-                ocean_df = pd.read_csv(os.path.join(DATA_PATH, file))
-                break
+        # Every row takes at least one line, so this bounds the row count
+        max_rows = count_lines(csv_path)
+        X = np.empty((max_rows, len(feature_cols)), dtype=np.int8)
+        y = np.empty((max_rows, len(target_cols)), dtype=target_dtype)
         
-        if ocean_df is None:
-            # Create a sample OCEAN dataset if download fails
-            print("Creating sample OCEAN dataset...")
-            ocean_df = self.create_sample_ocean_dataset()
+        n_rows = n_dropped = 0
+        chunks = pd.read_csv(csv_path, usecols=feature_cols + target_cols, chunksize=chunk_rows,
+                             dtype={col: np.float32 for col in feature_cols})
+        for chunk in chunks:
+            answers = chunk[feature_cols].to_numpy()
+            targets = chunk[target_cols]
+            
+            # NaN answers fail both comparisons
+            valid = ((answers >= 1) & (answers <= 5)).all(axis=1) & targets.notna().all(axis=1).to_numpy()
+            if target_values is not None:
+                valid &= targets.isin(target_values).all(axis=1).to_numpy()
+            
+            count = int(valid.sum())
+            X[n_rows:n_rows + count] = answers[valid]
+            y[n_rows:n_rows + count] = targets.to_numpy()[valid]
+            n_rows += count
+            n_dropped += len(chunk) - count
         
-        return self.preprocess_ocean_data(ocean_df)
+        # Shrink in place rather than copying into smaller arrays
+        X.resize((n_rows, len(feature_cols)), refcheck=False)
+        y.resize((n_rows, len(target_cols)), refcheck=False)
+        if n_dropped:
+            print(f"Dropped {n_dropped} invalid rows from {os.path.basename(csv_path)}")
+        
+        return X, y, feature_cols
     
-    def create_sample_mbti_dataset(self):
-        """Create a sample MBTI dataset for testing"""
-        np.random.seed(42)
-        n_samples = 1000
+    def find_dataset_file(self, name_patterns):
+        """Return the first CSV in DATA_PATH whose name contains one of the patterns"""
+        if not os.path.isdir(DATA_PATH):
+            return None
+        for file in sorted(os.listdir(DATA_PATH)):
+            if file.endswith('.csv') and any(pattern in file.lower() for pattern in name_patterns):
+                return os.path.join(DATA_PATH, file)
+        return None
+    
+    def cache_dir(self, slug, checksum):
+        """Cache directory for one version of a dataset's preprocessed arrays"""
+        return os.path.join(DATASET_CACHE_PATH, slug.replace('/', '__'), f"{checksum[:16]}-v{DATASET_CACHE_VERSION}")
+    
+    def save_cache(self, cache_dir, dataset):
+        """Write (X, y, *column_lists) to cache_dir as .npy files and metadata"""
+        X, y, *columns = dataset
+        parent = os.path.dirname(cache_dir)
+        os.makedirs(parent, exist_ok=True)
+        
+        # Build the entry in a temporary directory and rename it into place so
+        # readers never see a partial entry
+        tmp_dir = tempfile.mkdtemp(dir=parent)
+        try:
+            np.save(os.path.join(tmp_dir, "X.npy"), np.asarray(X))
+            # Object arrays cannot be memory-mapped, so labels are stored as fixed-width strings
+            y = np.asarray(y)
+            np.save(os.path.join(tmp_dir, "y.npy"), y.astype(str) if y.dtype == object else y)
+            with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+                json.dump({"version": DATASET_CACHE_VERSION, "columns": columns}, f)
+            os.replace(tmp_dir, cache_dir)
+        except OSError:
+            # Another process already wrote this entry
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    
+    def load_cache(self, cache_dir):
+        """Load (X, y, *column_lists) from a cache entry, or None if it does not exist"""
+        try:
+            with open(os.path.join(cache_dir, "meta.json")) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
         
+        X = np.load(os.path.join(cache_dir, "X.npy"), mmap_mode=DATASET_CACHE_MMAP_MODE)
+        y = np.load(os.path.join(cache_dir, "y.npy"), mmap_mode=DATASET_CACHE_MMAP_MODE)
+        return (X, y, *meta["columns"])
+    
+    def load_latest_cache(self, slug):
+        """Load the most recently written cache entry of a dataset, if any"""
+        slug_dir = os.path.dirname(self.cache_dir(slug, ""))
+        if not os.path.isdir(slug_dir):
+            return None
+        
+        entries = [os.path.join(slug_dir, name) for name in os.listdir(slug_dir)
+                   if name.endswith(f"-v{DATASET_CACHE_VERSION}")]
+        for entry in sorted(entries, key=os.path.getmtime, reverse=True):
+            cached = self.load_cache(entry)
+            if cached is not None:
+                return cached
+        return None
+    
+    def create_sample_mbti_dataset(self, n_samples=1000, seed=42):
+        """Create a sample MBTI dataset for testing"""
         # Sample questions and responses
         questions = [
             "I prefer working in groups rather than alone",
@@ -86,26 +253,15 @@ class DatasetLoader:
             "I enjoy philosophical discussions"
         ]
         
-        data = []
-        for i in range(n_samples):
-            # Generate random responses (1-5 scale)
-            responses = np.random.randint(1, 6, len(questions))
-            
-            # Calculate MBTI type based on responses
-            mbti_type = self.calculate_mbti_type(responses)
-            
-            row = {'type': mbti_type}
-            for j, q in enumerate(questions):
-                row[f'q{j+1}'] = responses[j]
-            data.append(row)
+        # Generate random responses (1-5 scale), one row per sample
+        responses = np.random.RandomState(seed).randint(1, 6, (n_samples, len(questions)))
         
-        return pd.DataFrame(data)
+        df = pd.DataFrame(responses, columns=[f'q{j+1}' for j in range(len(questions))])
+        df.insert(0, 'type', self.calculate_mbti_type(responses))
+        return df
     
-    def create_sample_ocean_dataset(self):
+    def create_sample_ocean_dataset(self, n_samples=1000, seed=42):
         """Create a sample OCEAN dataset for testing"""
-        np.random.seed(42)
-        n_samples = 1000
-        
         # OCEAN questions
         questions = [
             "I am the life of the party",
@@ -140,72 +296,55 @@ class DatasetLoader:
             "I don't mind being the center of attention"
         ]
         
-        data = []
-        for i in range(n_samples):
-            # Generate random responses (1-5 scale)
-            responses = np.random.randint(1, 6, len(questions))
-            
-            # Calculate OCEAN scores
-            ocean_scores = self.calculate_ocean_scores(responses)
-            
-            row = {
-                'O': ocean_scores[0],
-                'C': ocean_scores[1], 
-                'E': ocean_scores[2],
-                'A': ocean_scores[3],
-                'N': ocean_scores[4]
-            }
-            for j, q in enumerate(questions):
-                row[f'q{j+1}'] = responses[j]
-            data.append(row)
-        
-        return pd.DataFrame(data)
+        # Generate random responses (1-5 scale), one row per sample
+        responses = np.random.RandomState(seed).randint(1, 6, (n_samples, len(questions)))
+        
+        ocean_scores = self.calculate_ocean_scores(responses)
+        df = pd.DataFrame(ocean_scores, columns=['O', 'C', 'E', 'A', 'N'])
+        for j in range(len(questions)):
+            df[f'q{j+1}'] = responses[:, j]
+        return df
     
     def calculate_mbti_type(self, responses):
-        """Calculate MBTI type from responses"""
-        # Simple scoring system
-        e_score = responses[0] + responses[1] + responses[9]  # Extraversion
-        i_score = 15 - e_score  # Introversion
+        """Calculate MBTI type from responses
         
-        s_score = responses[2] + responses[7] + responses[13]  # Sensing
-        n_score = 15 - s_score  # Intuition
+        Takes one response vector and returns its type, or a samples-by-questions
+        matrix and returns an array with one type per row.
+        """
+        responses = np.asarray(responses)
         
-        t_score = responses[4] + responses[12] + responses[11]  # Thinking
-        f_score = 15 - t_score  # Feeling
+        # Simple scoring system; each opposite letter scores 15 minus its pair
+        e_score = responses[..., [0, 1, 9]].sum(axis=-1)  # Extraversion
+        s_score = responses[..., [2, 7, 13]].sum(axis=-1)  # Sensing
+        t_score = responses[..., [4, 12, 11]].sum(axis=-1)  # Thinking
+        j_score = responses[..., [2, 7, 14]].sum(axis=-1)  # Judging
         
-        j_score = responses[2] + responses[7] + responses[14]  # Judging
-        p_score = 15 - j_score  # Perceiving
+        # Index into MBTI_TYPES: each letter is one bit, E/S/T/J being 0
+        type_index = (
+            8 * (e_score <= 15 - e_score) + 4 * (s_score <= 15 - s_score) +
+            2 * (t_score <= 15 - t_score) + (j_score <= 15 - j_score)
+        )
         
-        mbti = ""
-        mbti += "E" if e_score > i_score else "I"
-        mbti += "S" if s_score > n_score else "N"
-        mbti += "T" if t_score > f_score else "F"
-        mbti += "J" if j_score > p_score else "P"
-        
-        return mbti
+        mbti = MBTI_TYPES[type_index]
+        return str(mbti) if responses.ndim == 1 else mbti
     
     def calculate_ocean_scores(self, responses):
-        """Calculate OCEAN scores from responses"""
-        # Openness (questions 6, 7, 8, 9, 10)
-        openness = (responses[5] + (6-responses[6]) + responses[7] + (6-responses[8]) + responses[9]) / 5
-        
-        # Conscientiousness (questions 11, 12, 13, 14, 15, 16, 17, 18, 19, 20)
-        conscientiousness = (responses[10] + responses[11] + responses[12] + responses[13] + 
-                           responses[14] + responses[15] + (6-responses[16]) + (6-responses[17]) + 
-                           (6-responses[18]) + (6-responses[19])) / 10
+        """Calculate OCEAN scores from responses
         
-        # Extraversion (questions 1, 2, 3, 4, 5)
-        extraversion = (responses[0] + responses[1] + responses[2] + responses[3] + 
-                       (6-responses[4])) / 5
+        Takes one response vector and returns [O, C, E, A, N], or a
+        samples-by-questions matrix and returns a samples-by-5 array.
+        """
+        responses = np.asarray(responses)
         
-        # Agreeableness (questions 21, 22, 23, 24, 25, 26)
-        agreeableness = (responses[20] + responses[21] + responses[22] + (6-responses[23]) + 
-                        (6-responses[24]) + (6-responses[25])) / 6
-        
-        # Neuroticism (questions 27, 28, 29, 30)
-        neuroticism = (responses[26] + responses[27] + responses[28] + (6-responses[29])) / 4
+        # Sums stay integral until the final division, as in per-item scoring
+        scores = [
+            (responses[..., keyed].sum(axis=-1) + 6 * len(reversed_) - responses[..., reversed_].sum(axis=-1)) / (len(keyed) + len(reversed_))
+            for keyed, reversed_ in OCEAN_SCORING_KEY
+        ]
         
-        return [openness, conscientiousness, extraversion, agreeableness, neuroticism]
+        if responses.ndim == 1:
+            return scores
+        return np.column_stack(scores)
     
     def preprocess_mbti_data(self, df):
         """Preprocess MBTI dataset"""
@@ -0,0 +1,132 @@
+import asyncio
+import collections
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+from metrics import REGISTRY, STAGE_SECONDS
+from config import MODEL_MMAP_MODE
+
+INFERENCE_REJECTED = REGISTRY.counter(
+    "inference_rejected_calls_total", "Inference calls rejected because the executor was saturated"
+)
+
+# Objects inference calls run against inside process-pool workers
+worker_targets = {}
+
+class ExecutorSaturated(Exception):
+    """Raised when the inference executor already has its maximum of pending calls"""
+
+    def __init__(self, pending, retry_after):
+        super().__init__(f"Inference executor is saturated ({pending} calls pending)")
+        self.retry_after = retry_after
+
+def init_worker():
+    """Load the question bank and models once per process-pool worker"""
+    from models import load_saved_models
+    from model_registry import ModelRegistry
+    from question_generator import QuestionGenerator
+
+    worker_targets["question_generator"] = QuestionGenerator()
+    worker_targets["mbti_model"], worker_targets["ocean_model"] = load_saved_models(ModelRegistry().active_dir(), MODEL_MMAP_MODE)
+
+def timed_call(target, method, args, submitted_at, resolve_target=None):
+    """Call target.method(*args) and return (seconds spent queued, result)
+
+    Uses the monotonic clock, which is shared by every process on the host, so
+    queue wait can be measured across a process pool too.
+    """
+    waited = time.monotonic() - submitted_at
+    resolved = resolve_target(target) if resolve_target else worker_targets[target]
+    return waited, getattr(resolved, method)(*args)
+
+class InferenceExecutor:
+    """Runs CPU-bound inference calls off the asyncio event loop
+
+    Calls name a target ("question_generator", "mbti_model" or "ocean_model")
+    and a method on it. In thread mode targets are resolved in this process
+    through `resolve_target`; in process mode every worker loads its own copies
+    at startup. Once `max_pending` calls are queued or running, new calls fail
+    fast with ExecutorSaturated instead of queueing without bound.
+    """
+
+    def __init__(self, resolve_target, kind="thread", workers=4, max_pending=256, retry_after=1):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor kind: {kind}")
+        self.resolve_target = resolve_target
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.recent_waits = collections.deque(maxlen=1024)
+        self.pool = self._create_pool()
+
+    def _create_pool(self):
+        if self.kind == "process":
+            # spawn rather than fork so workers do not inherit the event loop's threads
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker
+            )
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+
+    async def call(self, target, method, *args):
+        """Run target.method(*args) on the executor and return its result"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            INFERENCE_REJECTED.inc()
+            raise ExecutorSaturated(self.pending, self.retry_after)
+
+        self.pending += 1
+        try:
+            # Process workers resolve targets themselves; the resolver only
+            # makes sense in this process
+            resolve_target = self.resolve_target if self.kind == "thread" else None
+            waited, result = await asyncio.wrap_future(self.pool.submit(
+                timed_call, target, method, args, time.monotonic(), resolve_target
+            ))
+        finally:
+            self.pending -= 1
+
+        self.completed += 1
+        STAGE_SECONDS.observe(waited, "inference_queue")
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self.recent_waits.append(waited)
+        return result
+
+    def restart(self):
+        """Replace process workers so they load freshly saved models
+
+        Thread workers already see model swaps through resolve_target; calls
+        still running in old process workers finish normally.
+        """
+        if self.kind == "process":
+            old_pool, self.pool = self.pool, self._create_pool()
+            old_pool.shutdown(wait=False)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        """Queue depth and wait time metrics"""
+        recent = np.array(self.recent_waits) if self.recent_waits else np.zeros(1)
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "queue_depth": max(0, self.pending - self.workers),
+            "completed_total": self.completed,
+            "rejected_total": self.rejected,
+            "wait_seconds_avg": self.wait_total / self.completed if self.completed else 0.0,
+            "wait_seconds_max": self.wait_max,
+            "wait_seconds_p50": float(np.percentile(recent, 50)),
+            "wait_seconds_p99": float(np.percentile(recent, 99))
+        }
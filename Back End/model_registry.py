@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Versioned model registry under MODEL_SAVE_PATH
+
+    models/
+        versions/<version>/        immutable trained models and manifest.json
+        ACTIVE                     name of the version the API serves
+
+Training writes into a staging directory that is renamed into versions/ once
+complete, so a version is never seen half-written. Activating a version only
+replaces the ACTIVE pointer, which API workers watch and reload from.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import stat
+import time
+import uuid
+from config import MODEL_SAVE_PATH
+
+MODEL_FILES = ["mbti_model.pkl", "ocean_model.pkl"]
+
+class ModelRegistry:
+    def __init__(self, root=MODEL_SAVE_PATH):
+        self.root = root
+        self.versions_dir = os.path.join(root, "versions")
+        self.pointer_path = os.path.join(root, "ACTIVE")
+
+    def create_staging(self):
+        """Create an empty directory for a training run to save its models into"""
+        os.makedirs(self.versions_dir, exist_ok=True)
+        staging_dir = os.path.join(self.versions_dir, f".staging-{uuid.uuid4().hex}")
+        os.makedirs(staging_dir)
+        return staging_dir
+
+    def publish(self, staging_dir, metrics=None, params=None):
+        """Turn a staging directory into a new immutable version and return its name"""
+        version = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        files = sorted(os.listdir(staging_dir))
+        manifest = {
+            "version": version,
+            "created_at": time.time(),
+            "metrics": metrics or {},
+            "params": params or {},
+            "files": {name: os.path.getsize(os.path.join(staging_dir, name)) for name in files}
+        }
+        with open(os.path.join(staging_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        read_only = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+        for name in files + ["manifest.json"]:
+            os.chmod(os.path.join(staging_dir, name), read_only)
+        os.replace(staging_dir, os.path.join(self.versions_dir, version))
+        return version
+
+    def discard(self, staging_dir):
+        """Remove a staging directory whose training run failed"""
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def activate(self, version):
+        """Point the API at a published version"""
+        if self.manifest(version) is None:
+            raise ValueError(f"Unknown model version: {version}")
+        tmp_path = f"{self.pointer_path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            f.write(version + "\n")
+        os.replace(tmp_path, self.pointer_path)
+
+    def rollback(self):
+        """Activate the version published just before the active one and return it"""
+        active = self.active_version()
+        versions = [v["version"] for v in self.versions()]
+        if active not in versions:
+            raise ValueError("No active model version to roll back from")
+        older = versions[:versions.index(active)]
+        if not older:
+            raise ValueError("No earlier model version to roll back to")
+        self.activate(older[-1])
+        return older[-1]
+
+    def active_version(self):
+        """Name of the active version, or None when nothing has been activated"""
+        try:
+            with open(self.pointer_path) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def active_dir(self):
+        """Directory holding the active models
+
+        Falls back to the registry root, where models were saved before
+        versioning, when no version is active.
+        """
+        version = self.active_version()
+        return os.path.join(self.versions_dir, version) if version else self.root
+
+    def has_models(self):
+        """Whether the active directory holds trained models"""
+        return all(os.path.exists(os.path.join(self.active_dir(), name)) for name in MODEL_FILES)
+
+    def manifest(self, version):
+        try:
+            with open(os.path.join(self.versions_dir, version, "manifest.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def versions(self):
+        """Manifests of all published versions, oldest first
+
+        Ordered by publication time rather than name: versions published in
+        the same second would otherwise be ordered by their random suffix.
+        """
+        if not os.path.isdir(self.versions_dir):
+            return []
+        manifests = [self.manifest(name) for name in os.listdir(self.versions_dir) if not name.startswith(".")]
+        return sorted((m for m in manifests if m is not None), key=lambda m: (m["created_at"], m["version"]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and switch trained model versions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List model versions and their metrics")
+    activate_parser = commands.add_parser("activate", help="Serve a given model version")
+    activate_parser.add_argument("version")
+    commands.add_parser("rollback", help="Serve the version before the active one")
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+    if args.command == "list":
+        active = registry.active_version()
+        for manifest in registry.versions():
+            marker = "*" if manifest["version"] == active else " "
+            print(f"{marker} {manifest['version']}  {json.dumps(manifest['metrics'])}")
+    elif args.command == "activate":
+        registry.activate(args.version)
+        print(f"Activated {args.version}")
+    else:
+        print(f"Rolled back to {registry.rollback()}")
+
+if __name__ == "__main__":
+    main()
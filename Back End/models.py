@@ -1,21 +1,97 @@
 import joblib
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, mean_squared_error
-from sklearn.preprocessing import StandardScaler
 import os
-from config import MODEL_SAVE_PATH
+from concurrent.futures import ProcessPoolExecutor
+from compiled_forest import CompiledForest
+from metrics import REGISTRY, STAGE_SECONDS, DURATION_BUCKETS
+from config import MODEL_SAVE_PATH, TRAIN_N_JOBS, TRAIN_PROCESSES
+
+MODEL_LOAD_SECONDS = REGISTRY.histogram(
+    "model_load_duration_seconds", "Time to load a saved model", ("model",), DURATION_BUCKETS
+)
+
+# scikit-learn is imported inside the methods that build and fit forests, so
+# loading compiled models for serving never pays for importing it
+
+class FeatureScaler:
+    """The fitted parameters of a StandardScaler, usable without scikit-learn"""
+    
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+def scale_features(scaler, X):
+    """Apply a fitted StandardScaler without sklearn's per-call validation overhead"""
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim != 2 or X.shape[1] != len(scaler.mean_):
+        raise ValueError(f"Expected input of shape (n_samples, {len(scaler.mean_)}), got {X.shape}")
+    return (X - scaler.mean_) / scaler.scale_
+
+def split_n_jobs(n_jobs, processes):
+    """Share the cores requested by n_jobs between concurrently fitting processes"""
+    if processes <= 1:
+        return n_jobs
+    if n_jobs is None:
+        n_jobs = 1
+    elif n_jobs < 0:
+        n_jobs = (os.cpu_count() or 1) + 1 + n_jobs
+    return max(1, n_jobs // processes)
+
+def compiled_path(filepath):
+    """Path of the array-backed inference artifact saved next to a model pickle"""
+    root, _ = os.path.splitext(filepath)
+    return root + ".compiled.joblib"
+
+def dump_atomic(data, filepath):
+    """joblib.dump to a temporary file and rename it over filepath
+    
+    Processes that memory-mapped the previous file keep reading its old pages
+    instead of seeing a truncated file.
+    """
+    tmp_path = f"{filepath}.tmp-{os.getpid()}"
+    joblib.dump(data, tmp_path)
+    os.replace(tmp_path, filepath)
+
+def save_compiled(filepath, compiled, scaler, **extra):
+    """Save the compiled forest and scaler uncompressed so they can be memory-mapped"""
+    scaler = FeatureScaler(scaler.mean_, scaler.scale_)
+    dump_atomic({'compiled': compiled, 'scaler': scaler, **extra}, compiled_path(filepath))
+
+def load_compiled(filepath, mmap_mode):
+    """Load an inference artifact, or return None if the model has none
+    
+    With mmap_mode='r' the node arrays stay in the page cache and are shared
+    by every process that maps the same file instead of being copied.
+    """
+    path = compiled_path(filepath)
+    if mmap_mode is None or not os.path.exists(path):
+        return None
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+def fit_forest(forest, X, y):
+    """Fit a forest and return it; module-level so worker processes can run it"""
+    return forest.fit(X, y)
 
 class MBTIModel:
-    def __init__(self):
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.scaler = StandardScaler()
+    def __init__(self, n_jobs=TRAIN_N_JOBS, n_estimators=100):
+        """n_jobs is the number of cores used to build the forest, -1 for all"""
+        self.n_jobs = n_jobs
+        self.n_estimators = n_estimators
+        self.model = None
+        self.scaler = None
+        self.compiled = None
         self.is_trained = False
         
     def train(self, X, y):
         """Train the MBTI model"""
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import accuracy_score
+        from sklearn.preprocessing import StandardScaler
+        
         print("Training MBTI model...")
+        self.model = RandomForestClassifier(n_estimators=self.n_estimators, random_state=42, n_jobs=self.n_jobs)
+        self.scaler = StandardScaler()
         
         # Split the data
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -26,62 +102,114 @@ class MBTIModel:
         
         # Train the model
         self.model.fit(X_train_scaled, y_train)
+        self.is_trained = True
+        self.compile()
         
-        # Evaluate
-        y_pred = self.model.predict(X_test_scaled)
+        # Evaluate with the compiled forest, which sums trees in a fixed order
+        # whatever n_jobs was used
+        y_pred = self.compiled.predict(X_test_scaled)
         accuracy = accuracy_score(y_test, y_pred)
         print(f"MBTI Model Accuracy: {accuracy:.3f}")
         
-        self.is_trained = True
         return accuracy
     
+    def compile(self):
+        """Flatten the trained forest into NumPy node arrays for fast inference"""
+        self.compiled = CompiledForest.from_forests([self.model])
+    
     def predict(self, X):
         """Predict MBTI type"""
         if not self.is_trained:
             raise ValueError("Model must be trained before making predictions")
         
-        X_scaled = self.scaler.transform(X)
-        return self.model.predict(X_scaled)
+        with STAGE_SECONDS.time("mbti_scale_features"):
+            X_scaled = scale_features(self.scaler, X)
+        with STAGE_SECONDS.time("mbti_forest_predict"):
+            return self.compiled.predict(X_scaled)
     
     def predict_proba(self, X):
         """Predict MBTI type probabilities"""
         if not self.is_trained:
             raise ValueError("Model must be trained before making predictions")
         
-        X_scaled = self.scaler.transform(X)
-        return self.model.predict_proba(X_scaled)
+        with STAGE_SECONDS.time("mbti_scale_features"):
+            X_scaled = scale_features(self.scaler, X)
+        with STAGE_SECONDS.time("mbti_forest_predict"):
+            return self.compiled.predict_proba(X_scaled)
     
     def save(self, filepath):
         """Save the model"""
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        joblib.dump({
+        dump_atomic({
             'model': self.model,
             'scaler': self.scaler,
             'is_trained': self.is_trained
         }, filepath)
+        if self.is_trained:
+            save_compiled(filepath, self.compiled, self.scaler)
     
-    def load(self, filepath):
-        """Load the model"""
+    def load(self, filepath, mmap_mode=None):
+        """Load the model
+        
+        With an mmap_mode, only the compiled inference arrays are mapped and the
+        sklearn forest is not deserialized, so the model can predict but not be
+        recompiled. Falls back to a full load for models saved without them.
+        """
+        data = load_compiled(filepath, mmap_mode)
+        if data is not None:
+            self.model = None
+            self.scaler = data['scaler']
+            self.compiled = data['compiled']
+            self.is_trained = True
+            return
+        
         data = joblib.load(filepath)
         self.model = data['model']
         self.scaler = data['scaler']
         self.is_trained = data['is_trained']
+        if self.is_trained:
+            self.compile()
 
 class OCEANModel:
-    def __init__(self):
-        self.models = {
-            'O': RandomForestRegressor(n_estimators=100, random_state=42),
-            'C': RandomForestRegressor(n_estimators=100, random_state=42),
-            'E': RandomForestRegressor(n_estimators=100, random_state=42),
-            'A': RandomForestRegressor(n_estimators=100, random_state=42),
-            'N': RandomForestRegressor(n_estimators=100, random_state=42)
-        }
-        self.scaler = StandardScaler()
+    def __init__(self, multi_output=False, n_jobs=TRAIN_N_JOBS, processes=TRAIN_PROCESSES, n_estimators=100):
+        """Per-trait mode fits one forest per OCEAN dimension; multi-output mode
+        fits a single forest whose trees predict all five traits at once.
+        
+        n_jobs is the number of cores used to build the forests, -1 for all. In
+        per-trait mode, up to `processes` trait forests are fitted concurrently
+        in worker processes, sharing those cores. Each forest has n_estimators
+        trees.
+        """
+        self.multi_output = multi_output
+        self.n_jobs = n_jobs
+        self.processes = processes
+        self.n_estimators = n_estimators
+        self.model = None
+        self.models = None
+        self.scaler = None
+        self.compiled = None
         self.is_trained = False
         
     def train(self, X, y):
         """Train the OCEAN model"""
+        from sklearn.ensemble import RandomForestRegressor
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import mean_squared_error
+        from sklearn.preprocessing import StandardScaler
+        
         print("Training OCEAN model...")
+        if self.multi_output:
+            self.model = RandomForestRegressor(n_estimators=self.n_estimators, random_state=42, n_jobs=self.n_jobs)
+        else:
+            trait_n_jobs = split_n_jobs(self.n_jobs, min(self.processes, 5))
+            self.models = {
+                'O': RandomForestRegressor(n_estimators=self.n_estimators, random_state=42, n_jobs=trait_n_jobs),
+                'C': RandomForestRegressor(n_estimators=self.n_estimators, random_state=42, n_jobs=trait_n_jobs),
+                'E': RandomForestRegressor(n_estimators=self.n_estimators, random_state=42, n_jobs=trait_n_jobs),
+                'A': RandomForestRegressor(n_estimators=self.n_estimators, random_state=42, n_jobs=trait_n_jobs),
+                'N': RandomForestRegressor(n_estimators=self.n_estimators, random_state=42, n_jobs=trait_n_jobs)
+            }
+        self.scaler = StandardScaler()
         
         # Split the data
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -90,42 +218,118 @@ class OCEANModel:
         X_train_scaled = self.scaler.fit_transform(X_train)
         X_test_scaled = self.scaler.transform(X_test)
         
-        # Train each OCEAN dimension separately
+        if self.multi_output:
+            # Train all OCEAN dimensions with one shared forest
+            self.model.fit(X_train_scaled, y_train)
+        else:
+            # Train each OCEAN dimension separately, concurrently if configured;
+            # every forest has a fixed random_state so the result is the same
+            traits = ['O', 'C', 'E', 'A', 'N']
+            forests = [self.models[trait] for trait in traits]
+            targets = [y_train[:, i] for i in range(len(traits))]
+            if self.processes > 1:
+                with ProcessPoolExecutor(max_workers=min(self.processes, len(traits))) as pool:
+                    forests = list(pool.map(fit_forest, forests, [X_train_scaled] * len(traits), targets))
+            else:
+                forests = [fit_forest(forest, X_train_scaled, target) for forest, target in zip(forests, targets)]
+            
+            self.models = dict(zip(traits, forests))
+        
+        self.is_trained = True
+        self.compile()
+        
+        # Evaluate with the compiled forests, which sum trees in a fixed order
+        # whatever n_jobs was used
+        y_pred = self.compiled.predict(X_test_scaled)
         mse_scores = {}
         for i, trait in enumerate(['O', 'C', 'E', 'A', 'N']):
-            self.models[trait].fit(X_train_scaled, y_train[:, i])
-            y_pred = self.models[trait].predict(X_test_scaled)
-            mse = mean_squared_error(y_test[:, i], y_pred)
+            mse = mean_squared_error(y_test[:, i], y_pred[:, i])
             mse_scores[trait] = mse
             print(f"{trait} MSE: {mse:.3f}")
         
-        self.is_trained = True
         return mse_scores
     
+    def compile(self):
+        """Flatten the trait forests into one set of NumPy node arrays"""
+        if self.multi_output:
+            self.compiled = CompiledForest.from_forests([self.model])
+        else:
+            self.compiled = CompiledForest.from_forests([self.models[trait] for trait in ['O', 'C', 'E', 'A', 'N']])
+    
     def predict(self, X):
         """Predict OCEAN scores"""
         if not self.is_trained:
             raise ValueError("Model must be trained before making predictions")
         
-        X_scaled = self.scaler.transform(X)
+        with STAGE_SECONDS.time("ocean_scale_features"):
+            X_scaled = scale_features(self.scaler, X)
+        with STAGE_SECONDS.time("ocean_forest_predict"):
+            trait_predictions = self.compiled.predict(X_scaled)
         predictions = {}
-        for trait in ['O', 'C', 'E', 'A', 'N']:
-            predictions[trait] = self.models[trait].predict(X_scaled)
+        for i, trait in enumerate(['O', 'C', 'E', 'A', 'N']):
+            predictions[trait] = trait_predictions[:, i]
         
         return predictions
     
     def save(self, filepath):
         """Save the model"""
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        joblib.dump({
+        dump_atomic({
+            'multi_output': self.multi_output,
+            'model': self.model,
             'models': self.models,
             'scaler': self.scaler,
             'is_trained': self.is_trained
         }, filepath)
+        if self.is_trained:
+            save_compiled(filepath, self.compiled, self.scaler, multi_output=self.multi_output)
     
-    def load(self, filepath):
-        """Load the model"""
+    def load(self, filepath, mmap_mode=None):
+        """Load the model
+        
+        With an mmap_mode, only the compiled inference arrays are mapped and the
+        sklearn forests are not deserialized, so the model can predict but not be
+        recompiled. Falls back to a full load for models saved without them.
+        """
+        data = load_compiled(filepath, mmap_mode)
+        if data is not None:
+            self.multi_output = data['multi_output']
+            self.model = None
+            self.models = None
+            self.scaler = data['scaler']
+            self.compiled = data['compiled']
+            self.is_trained = True
+            return
+        
         data = joblib.load(filepath)
+        self.multi_output = data.get('multi_output', False)
+        self.model = data.get('model')
         self.models = data['models']
         self.scaler = data['scaler']
         self.is_trained = data['is_trained']
+        if self.is_trained:
+            self.compile()
+
+def load_saved_models(model_dir=MODEL_SAVE_PATH, mmap_mode=None):
+    """Load whichever saved models exist in model_dir, returning None for missing ones"""
+    mbti_path = os.path.join(model_dir, "mbti_model.pkl")
+    ocean_path = os.path.join(model_dir, "ocean_model.pkl")
+    mbti_model, ocean_model = None, None
+    
+    if os.path.exists(mbti_path):
+        mbti_model = MBTIModel()
+        with MODEL_LOAD_SECONDS.time("mbti"):
+            mbti_model.load(mbti_path, mmap_mode=mmap_mode)
+        print("Loaded existing MBTI model")
+    else:
+        print("No existing MBTI model found. Train models first.")
+    
+    if os.path.exists(ocean_path):
+        ocean_model = OCEANModel()
+        with MODEL_LOAD_SECONDS.time("ocean"):
+            ocean_model.load(ocean_path, mmap_mode=mmap_mode)
+        print("Loaded existing OCEAN model")
+    else:
+        print("No existing OCEAN model found. Train models first.")
+    
+    return mbti_model, ocean_model
@@ -1,10 +1,67 @@
+import functools
+import hashlib
+import json
 import random
+import numpy as np
+from metrics import timed
 from typing import List, Dict, Any
 
+MBTI_DIMENSIONS = ["E", "I", "S", "N", "T", "F", "J", "P"]
+MBTI_PAIRS = [("E", "I"), ("S", "N"), ("T", "F"), ("J", "P")]
+OCEAN_TRAITS = ["O", "C", "E", "A", "N"]
+
+# Seeded question permutations kept in memory, so repeat requests for a seed
+# (such as verifying its question set at scoring time) skip the shuffle
+PERMUTATION_CACHE_SIZE = 4096
+
 class QuestionGenerator:
     def __init__(self):
         self.mbti_questions = self._load_mbti_questions()
         self.ocean_questions = self._load_ocean_questions()
+        self._build_question_indexes()
+        self._compile_ocean_weights()
+        self.bank_version = self._compute_bank_version()
+        self.question_permutation = functools.lru_cache(maxsize=PERMUTATION_CACHE_SIZE)(self._question_permutation)
+    
+    def _compute_bank_version(self) -> str:
+        """Content hash of both question banks, used to key cached responses"""
+        bank = json.dumps([self.mbti_questions, self.ocean_questions], sort_keys=True)
+        return hashlib.sha256(bank.encode()).hexdigest()[:16]
+    
+    def _build_question_indexes(self):
+        """Index both question banks by question id
+        
+        Each MBTI question also gets an option-text -> dimension index map, with
+        the first option's dimension as the fallback for unknown answer texts.
+        """
+        self.mbti_positions = {q["id"]: i for i, q in enumerate(self.mbti_questions)}
+        self.ocean_positions = {q["id"]: i for i, q in enumerate(self.ocean_questions)}
+        # Reversed so the first of any repeated option texts wins, as with list.index
+        self.mbti_answer_dimensions = [
+            {option: MBTI_DIMENSIONS.index(dimension) for option, dimension in reversed(list(zip(q["options"], q["dimensions"])))}
+            for q in self.mbti_questions
+        ]
+        self.mbti_default_dimensions = [MBTI_DIMENSIONS.index(q["dimensions"][0]) for q in self.mbti_questions]
+    
+    def _compile_ocean_weights(self):
+        """Compile the OCEAN question bank into dimension-by-question matrices
+        
+        A reverse-keyed answer scores as (6 - answer), so every scored answer
+        is sign * answer + offset with sign in {1, -1} and offset in {0, 6}.
+        """
+        num_questions = len(self.ocean_questions)
+        self.ocean_membership = np.zeros((len(OCEAN_TRAITS), num_questions))
+        sign = np.ones(num_questions)
+        offset = np.zeros(num_questions)
+        
+        for i, question in enumerate(self.ocean_questions):
+            self.ocean_membership[OCEAN_TRAITS.index(question["dimension"]), i] = 1
+            if question["reverse"]:
+                sign[i] = -1
+                offset[i] = 6
+        
+        self.ocean_weights = self.ocean_membership * sign
+        self.ocean_offsets = self.ocean_membership * offset
     
     def _load_mbti_questions(self) -> List[Dict[str, Any]]:
         """Load MBTI-specific questions"""
@@ -743,68 +800,231 @@ class QuestionGenerator:
             }
         ]
     
-    def get_mbti_questions(self, num_questions: int = 20) -> List[Dict[str, Any]]:
-        """Get a random sample of MBTI questions"""
-        return random.sample(self.mbti_questions, min(num_questions, len(self.mbti_questions)))
+    def get_mbti_questions(self, num_questions: int = 20, seed: int = None) -> List[Dict[str, Any]]:
+        """Get a random sample of MBTI questions, reproducible when seeded"""
+        return [self.mbti_questions[i] for i in self.sample_positions("mbti", num_questions, seed)]
     
-    def get_ocean_questions(self, num_questions: int = 40) -> List[Dict[str, Any]]:
-        """Get a random sample of OCEAN questions"""
-        return random.sample(self.ocean_questions, min(num_questions, len(self.ocean_questions)))
+    def get_ocean_questions(self, num_questions: int = 40, seed: int = None) -> List[Dict[str, Any]]:
+        """Get a random sample of OCEAN questions, reproducible when seeded"""
+        return [self.ocean_questions[i] for i in self.sample_positions("ocean", num_questions, seed)]
     
-    def calculate_mbti_score(self, answers: List[str]) -> tuple[str, dict]:
-        """Calculate MBTI type from answers"""
-        # Simple scoring system based on question dimensions
-        scores = {"E": 0, "I": 0, "S": 0, "N": 0, "T": 0, "F": 0, "J": 0, "P": 0}
+    @timed("question_sampling")
+    def sample_positions(self, kind: str, num_questions: int, seed: int = None, cache: bool = True) -> List[int]:
+        """Positions of a random sample of MBTI or OCEAN questions in their bank
         
-        for i, answer in enumerate(answers):
-            if i < len(self.mbti_questions):
-                question = self.mbti_questions[i]
-                if "dimensions" in question:
-                    # Map answer to dimension
-                    option_index = question["options"].index(answer) if answer in question["options"] else 0
-                    dimension = question["dimensions"][option_index]
-                    scores[dimension] += 1
+        With a seed the sample is the start of that seed's permutation of the
+        bank, so the same seed always gives the same questions in the same order.
+        Pass cache=False for one-off random seeds, so their permutations do not
+        evict those of seeds that are asked for again.
+        """
+        bank_size = len(self.mbti_questions if kind == "mbti" else self.ocean_questions)
+        if seed is None:
+            return random.sample(range(bank_size), min(num_questions, bank_size))
+        permutation = self.question_permutation if cache else self._question_permutation
+        return list(permutation(kind, seed)[:max(num_questions, 0)])
+    
+    def _question_permutation(self, kind: str, seed: int) -> tuple:
+        """Shuffle of a bank's positions drawn from a per-request RNG"""
+        positions = list(range(len(self.mbti_questions if kind == "mbti" else self.ocean_questions)))
+        # String seeds are hashed deterministically, so every process and host
+        # draws the same permutation for a seed and bank version
+        random.Random(f"{self.bank_version}:{kind}:{seed}").shuffle(positions)
+        return tuple(positions)
+    
+    def question_positions(self, question_ids: List[int], kind: str) -> List[int]:
+        """Resolve question ids to positions in the MBTI or OCEAN question bank"""
+        positions_by_id = self.mbti_positions if kind == "mbti" else self.ocean_positions
+        positions = []
+        for question_id in question_ids:
+            if question_id not in positions_by_id:
+                raise ValueError(f"Unknown {kind.upper()} question id: {question_id}")
+            positions.append(positions_by_id[question_id])
+        
+        if len(set(positions)) != len(positions):
+            raise ValueError(f"Duplicate answers for the same {kind.upper()} question")
+        return positions
+    
+    @timed("mbti_scoring")
+    def calculate_mbti_score(self, answers: List[str], question_ids: List[int] = None) -> tuple[str, dict]:
+        """Calculate MBTI type from answers
+        
+        Answers are matched to questions by `question_ids` when given, and by
+        their position in the question bank otherwise.
+        """
+        if not answers:
+            raise ValueError("No answers provided")
+        
+        positions = None if question_ids is None else [self.question_positions(question_ids, "mbti")]
+        types, breakdowns, confidences = self.score_mbti_matrix(
+            self.mbti_dimension_matrix([answers], positions), np.array([len(answers)])
+        )
+        breakdown = dict(zip(MBTI_DIMENSIONS, breakdowns[0].tolist()))
+        return types[0], breakdown, float(confidences[0])
+    
+    @timed("mbti_scoring")
+    def score_mbti_answer_sets(self, answer_sets: List[List[str]], question_id_sets: List[List[int]]):
+        """Score many MBTI answer sets in one vectorized pass
+        
+        Returns one (result, error) pair per answer set, in order, where result
+        is the (type, breakdown, confidence) tuple of calculate_mbti_score.
+        """
+        outcomes = [(None, None)] * len(answer_sets)
+        valid, position_sets = [], []
+        for i, (answers, question_ids) in enumerate(zip(answer_sets, question_id_sets)):
+            try:
+                if not answers:
+                    raise ValueError("No answers provided")
+                position_sets.append(self.question_positions(question_ids, "mbti"))
+                valid.append(i)
+            except ValueError as e:
+                outcomes[i] = (None, str(e))
+        
+        valid_answers = [answer_sets[i] for i in valid]
+        types, breakdowns, confidences = self.score_mbti_matrix(
+            self.mbti_dimension_matrix(valid_answers, position_sets),
+            np.array([len(answers) for answers in valid_answers])
+        )
+        for row, i in enumerate(valid):
+            breakdown = dict(zip(MBTI_DIMENSIONS, breakdowns[row].tolist()))
+            outcomes[i] = ((types[row], breakdown, float(confidences[row])), None)
+        
+        return outcomes
+    
+    def mbti_dimension_matrix(self, answer_sets: List[List[str]], position_sets: List[List[int]] = None) -> np.ndarray:
+        """Map answer texts to MBTI dimension indices, padding ragged answer sets with -1
+        
+        Without `position_sets`, answer i is matched against mbti_questions[i] and
+        answers past the end of the bank are ignored.
+        """
+        if position_sets is None:
+            position_sets = [range(min(len(answers), len(self.mbti_questions))) for answers in answer_sets]
+        
+        num_columns = max((len(positions) for positions in position_sets), default=0)
+        dimensions = np.full((len(answer_sets), num_columns), -1)
+        
+        for row, (answers, positions) in enumerate(zip(answer_sets, position_sets)):
+            for column, (answer, position) in enumerate(zip(answers, positions)):
+                dimensions[row, column] = self.mbti_answer_dimensions[position].get(
+                    answer, self.mbti_default_dimensions[position]
+                )
+        
+        return dimensions
+    
+    def score_mbti_matrix(self, dimensions: np.ndarray, totals: np.ndarray):
+        """Score many MBTI respondents at once
+        
+        `dimensions` is a respondent-by-answer matrix as returned by
+        mbti_dimension_matrix and `totals` the number of answers each respondent
+        gave. Returns the types, a breakdown matrix in MBTI_DIMENSIONS order and
+        the confidences.
+        """
+        num_respondents = dimensions.shape[0]
+        rows, columns = np.nonzero(dimensions >= 0)
+        scores = np.bincount(
+            rows * len(MBTI_DIMENSIONS) + dimensions[rows, columns],
+            minlength=num_respondents * len(MBTI_DIMENSIONS)
+        ).reshape(num_respondents, len(MBTI_DIMENSIONS))
+        return self.score_mbti_counts(scores, totals)
+    
+    def score_mbti_counts(self, scores: np.ndarray, totals: np.ndarray):
+        """Score MBTI respondents from how many answers chose each dimension
+        
+        `scores` is a respondent-by-dimension count matrix in MBTI_DIMENSIONS
+        order. Returns the same as score_mbti_matrix.
+        """
+        num_respondents = scores.shape[0]
         
         # Calculate percentages for each dimension
-        total_questions = len(answers)
-        breakdown = {}
-        for dimension in scores:
-            breakdown[dimension] = scores[dimension] / total_questions if total_questions > 0 else 0.5
+        totals = np.asarray(totals)
+        breakdowns = scores / totals[:, None]
+        
+        # Determine MBTI type and confidence based on how clear the preferences are
+        letters = []
+        confidences = np.full(num_respondents, 0.5)
+        for first, second in MBTI_PAIRS:
+            first_scores = scores[:, MBTI_DIMENSIONS.index(first)]
+            second_scores = scores[:, MBTI_DIMENSIONS.index(second)]
+            letters.append(np.where(first_scores > second_scores, first, second))
+            confidences += np.abs(first_scores - second_scores) / (totals * 2)  # Max 0.125 per pair
+        
+        types = ["".join(type_letters) for type_letters in zip(*letters)]
+        return types, breakdowns, np.minimum(confidences, 1.0)
+    
+    @timed("ocean_scoring")
+    def calculate_ocean_scores(self, answers: List[int], question_ids: List[int] = None) -> Dict[str, float]:
+        """Calculate OCEAN scores from answers
+        
+        Answers are matched to questions by `question_ids` when given, and by
+        their position in the question bank otherwise.
+        """
+        positions = None if question_ids is None else [self.question_positions(question_ids, "ocean")]
+        responses, mask = self.ocean_response_matrix([answers], positions)
+        trait_scores = self.score_ocean_matrix(responses, mask)
+        return dict(zip(OCEAN_TRAITS, trait_scores[0].tolist()))
+    
+    @timed("ocean_scoring")
+    def score_ocean_answer_sets(self, answer_sets: List[List[int]], question_id_sets: List[List[int]]):
+        """Score many OCEAN answer sets in one vectorized pass
+        
+        Returns one (scores, error) pair per answer set, in order.
+        """
+        outcomes = [(None, None)] * len(answer_sets)
+        valid, position_sets = [], []
+        for i, (answers, question_ids) in enumerate(zip(answer_sets, question_id_sets)):
+            try:
+                if any(not 1 <= answer <= 5 for answer in answers):
+                    raise ValueError("Answers must be on a 1-5 scale")
+                position_sets.append(self.question_positions(question_ids, "ocean"))
+                valid.append(i)
+            except ValueError as e:
+                outcomes[i] = (None, str(e))
+        
+        responses, mask = self.ocean_response_matrix([answer_sets[i] for i in valid], position_sets)
+        trait_scores = self.score_ocean_matrix(responses, mask)
+        for row, i in enumerate(valid):
+            outcomes[i] = (dict(zip(OCEAN_TRAITS, trait_scores[row].tolist())), None)
+        
+        return outcomes
+    
+    def ocean_response_matrix(self, answer_sets: List[List[int]], position_sets: List[List[int]] = None):
+        """Pack OCEAN answer sets into a respondent-by-question matrix and answered-mask
+        
+        Without `position_sets`, answer i belongs to ocean_questions[i] and
+        answers past the end of the bank are ignored.
+        """
+        if position_sets is None:
+            position_sets = [range(min(len(answers), len(self.ocean_questions))) for answers in answer_sets]
         
-        # Determine MBTI type
-        mbti = ""
-        mbti += "E" if scores["E"] > scores["I"] else "I"
-        mbti += "S" if scores["S"] > scores["N"] else "N"
-        mbti += "T" if scores["T"] > scores["F"] else "F"
-        mbti += "J" if scores["J"] > scores["P"] else "P"
+        responses = np.zeros((len(answer_sets), len(self.ocean_questions)))
+        mask = np.zeros((len(answer_sets), len(self.ocean_questions)), dtype=bool)
         
-        # Calculate confidence based on how clear the preferences are
-        confidence = 0.5
-        for pair in [("E", "I"), ("S", "N"), ("T", "F"), ("J", "P")]:
-            diff = abs(scores[pair[0]] - scores[pair[1]])
-            confidence += diff / (total_questions * 2)  # Max 0.125 per pair
+        for row, (answers, positions) in enumerate(zip(answer_sets, position_sets)):
+            positions = list(positions)
+            responses[row, positions] = answers[:len(positions)]
+            mask[row, positions] = True
         
-        return mbti, breakdown, min(confidence, 1.0)
+        return responses, mask
     
-    def calculate_ocean_scores(self, answers: List[int]) -> Dict[str, float]:
-        """Calculate OCEAN scores from answers"""
-        scores = {"O": 0, "C": 0, "E": 0, "A": 0, "N": 0}
-        counts = {"O": 0, "C": 0, "E": 0, "A": 0, "N": 0}
+    def score_ocean_matrix(self, responses: np.ndarray, mask: np.ndarray = None) -> np.ndarray:
+        """Score one respondent (1-D) or many respondents (2-D) at once
         
-        for i, answer in enumerate(answers):
-            if i < len(self.ocean_questions):
-                question = self.ocean_questions[i]
-                dimension = question["dimension"]
-                reverse = question["reverse"]
-                
-                # Adjust score based on reverse scoring
-                score = answer if not reverse else (6 - answer)
-                scores[dimension] += score
-                counts[dimension] += 1
+        Column i of `responses` answers ocean_questions[i]. `mask` marks which
+        answers are present for ragged batches; by default every column counts.
+        Returns per-trait averages in OCEAN_TRAITS order, 0 for traits without
+        any answered question.
+        """
+        responses = np.asarray(responses, dtype=float)
+        num_answers = responses.shape[-1]
+        weights = self.ocean_weights[:, :num_answers]
+        offsets = self.ocean_offsets[:, :num_answers]
+        membership = self.ocean_membership[:, :num_answers]
         
-        # Calculate averages
-        for dimension in scores:
-            if counts[dimension] > 0:
-                scores[dimension] = scores[dimension] / counts[dimension]
+        if mask is None:
+            sums = responses @ weights.T + offsets.sum(axis=1)
+            counts = np.broadcast_to(membership.sum(axis=1), sums.shape)
+        else:
+            mask = np.asarray(mask, dtype=float)
+            sums = (responses * mask) @ weights.T + mask @ offsets.T
+            counts = mask @ membership.T
         
-        return scores
+        return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
@@ -0,0 +1,29 @@
+import hashlib
+import hmac
+
+# Bumped if the token layout or the way seeds map to questions changes
+TOKEN_VERSION = "1"
+
+def sign(secret, payload):
+    return hmac.new(secret.encode(), payload.encode(), hashlib.sha256).hexdigest()[:32]
+
+def encode_question_token(secret, kind, bank_version, num_questions, seed):
+    """Signed token from which the server can recompute a sampled question set
+
+    Everything needed to redraw the sample is in the token, so no per-session
+    state is stored and any API host sharing the secret can verify it.
+    """
+    payload = f"{TOKEN_VERSION}.{kind}.{bank_version}.{num_questions}.{seed}"
+    return f"{payload}.{sign(secret, payload)}"
+
+def decode_question_token(secret, token):
+    """Return (kind, bank_version, num_questions, seed), raising ValueError for invalid tokens"""
+    payload, _, signature = token.rpartition(".")
+    if not payload or not hmac.compare_digest(signature.encode(), sign(secret, payload).encode()):
+        raise ValueError("Invalid question token")
+
+    fields = payload.split(".")
+    if len(fields) != 5 or fields[0] != TOKEN_VERSION:
+        raise ValueError("Unsupported question token version")
+    _, kind, bank_version, num_questions, seed = fields
+    return kind, bank_version, int(num_questions), int(seed)
@@ -0,0 +1,54 @@
+import hashlib
+from fastapi import Response
+
+def make_etag(*parts):
+    """Strong ETag from the parts that determine a response body"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()[:32]}"'
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header matches etag (weak comparison, as RFC 9110 requires)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def json_response(body, etag, cache_control, if_none_match=None, headers=None):
+    """Respond with a pre-serialized JSON body, or 304 Not Modified if the client has it"""
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+class CachedResponse:
+    """A JSON response body serialized once, with a strong ETag over its bytes"""
+
+    def __init__(self, body, cache_control):
+        self.body = body
+        self.etag = make_etag(body)
+        self.cache_control = cache_control
+
+    def respond(self, if_none_match=None):
+        return json_response(self.body, self.etag, self.cache_control, if_none_match)
+
+class ResponseCache:
+    """Pre-serialized responses, rebuilt only when the version they were built from changes"""
+
+    def __init__(self):
+        self.version = None
+        self.entries = {}
+
+    def get(self, version, key, build):
+        """Return the entry for key, calling build() to create it on first use"""
+        if version != self.version:
+            self.entries = {}
+            self.version = version
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = build()
+        return entry
@@ -0,0 +1,205 @@
+import asyncio
+import collections
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from metrics import REGISTRY
+
+RESULT_FLUSH_SECONDS = REGISTRY.histogram("result_store_flush_duration_seconds", "Time to write one batch of results")
+RESULT_DROPPED = REGISTRY.counter("result_store_dropped_results_total", "Results dropped because the backlog was full")
+
+class SQLiteResultBackend:
+    """Stores assessment results in a SQLite database in WAL mode
+
+    Each write is one transaction, so a flushed batch is either fully stored or
+    not at all, and WAL keeps committed batches intact if the process crashes.
+    Readers are not blocked while a batch is written, and several API workers
+    can share one database file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+
+    @property
+    def connection(self):
+        """Connection opened on first use in each process, so pre-forked workers never share one"""
+        if self._connection is None or self._connection_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    model_version TEXT,
+                    answers TEXT NOT NULL,
+                    result TEXT NOT NULL
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS results_kind_created ON results (kind, created_at)")
+            connection.commit()
+            self._connection, self._connection_pid = connection, os.getpid()
+        return self._connection
+
+    def write(self, records):
+        """Insert records in one transaction"""
+        rows = [
+            (r["id"], r["kind"], r["created_at"], r["model_version"], json.dumps(r["answers"]), json.dumps(r["result"]))
+            for r in records
+        ]
+        with self.lock:
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO results (id, kind, created_at, model_version, answers, result) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+
+    def get(self, result_id):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT id, kind, created_at, model_version, answers, result FROM results WHERE id = ?", (result_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0], "kind": row[1], "created_at": row[2], "model_version": row[3],
+            "answers": json.loads(row[4]), "result": json.loads(row[5])
+        }
+
+    def close(self):
+        if self._connection is not None and self._connection_pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+# Result backends by name; a backend provides write(records), get(result_id) and close()
+RESULT_BACKENDS = {"sqlite": SQLiteResultBackend}
+
+def create_result_backend(kind, path):
+    if kind not in RESULT_BACKENDS:
+        raise ValueError(f"Unknown result store backend: {kind}")
+    return RESULT_BACKENDS[kind](path)
+
+class ResultStore:
+    """Write-behind buffer that persists results in bulk
+
+    `add` only appends to an in-memory buffer, so request handlers never wait
+    on the database. `run` flushes the buffer in one transaction per
+    `flush_size` records, as soon as that many are waiting or every
+    `flush_interval` seconds, on a thread off the event loop. A failed flush
+    keeps its records for the next attempt. Past `max_backlog` buffered records
+    the oldest are dropped, so a stalled database cannot exhaust memory.
+    Results still buffered when the process is killed are lost; at most
+    `flush_interval` seconds' worth under normal load.
+    """
+
+    def __init__(self, backend, flush_size=500, flush_interval=1.0, max_backlog=100_000):
+        self.backend = backend
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_backlog = max_backlog
+        self.pending = collections.OrderedDict()
+        self.flushing = {}
+        self.flush_lock = asyncio.Lock()
+        self.flush_needed = asyncio.Event()
+        self.written = 0
+        self.flushes = 0
+        self.errors = 0
+        self.dropped = 0
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+        self.flush_seconds_last = 0.0
+
+    def add(self, kind, answers, result, model_version=None):
+        """Buffer one result and return its id"""
+        result_id = uuid.uuid4().hex
+        if len(self.pending) >= self.max_backlog:
+            self.pending.popitem(last=False)
+            self.dropped += 1
+            RESULT_DROPPED.inc()
+        self.pending[result_id] = {
+            "id": result_id,
+            "kind": kind,
+            "created_at": time.time(),
+            "model_version": model_version,
+            "answers": answers,
+            "result": result
+        }
+        if len(self.pending) >= self.flush_size:
+            self.flush_needed.set()
+        return result_id
+
+    async def get(self, result_id):
+        """A stored result, including ones not yet flushed, or None"""
+        record = self.pending.get(result_id) or self.flushing.get(result_id)
+        if record is not None:
+            return record
+        return await asyncio.to_thread(self.backend.get, result_id)
+
+    async def run(self):
+        """Flush on size or time thresholds until cancelled"""
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_needed.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_needed.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write every buffered result, flush_size records per transaction"""
+        async with self.flush_lock:
+            while self.pending:
+                count = min(len(self.pending), self.flush_size)
+                self.flushing = dict(self.pending.popitem(last=False) for _ in range(count))
+                started = time.perf_counter()
+                try:
+                    await asyncio.to_thread(self.backend.write, list(self.flushing.values()))
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Error writing results: {str(e)}")
+                    # Put the batch back in front of newer results and retry on the next tick
+                    for result_id, record in reversed(self.flushing.items()):
+                        self.pending[result_id] = record
+                        self.pending.move_to_end(result_id, last=False)
+                    return
+                finally:
+                    self.flushing = {}
+
+                elapsed = time.perf_counter() - started
+                RESULT_FLUSH_SECONDS.observe(elapsed)
+                self.written += count
+                self.flushes += 1
+                self.flush_seconds_total += elapsed
+                self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+                self.flush_seconds_last = elapsed
+
+    async def close(self):
+        """Flush what is left and close the backend"""
+        await self.flush()
+        await asyncio.to_thread(self.backend.close)
+
+    def stats(self):
+        """Backlog and flush latency metrics"""
+        oldest = next(iter(self.pending.values()), None)
+        return {
+            "backlog": len(self.pending),
+            "flushing": len(self.flushing),
+            "oldest_pending_seconds": time.time() - oldest["created_at"] if oldest else 0.0,
+            "written_total": self.written,
+            "flushes_total": self.flushes,
+            "flush_errors_total": self.errors,
+            "dropped_total": self.dropped,
+            "flush_seconds_avg": self.flush_seconds_total / self.flushes if self.flushes else 0.0,
+            "flush_seconds_max": self.flush_seconds_max,
+            "flush_seconds_last": self.flush_seconds_last
+        }
@@ -0,0 +1,191 @@
+import collections
+import secrets
+import time
+import numpy as np
+from question_generator import MBTI_DIMENSIONS, OCEAN_TRAITS
+
+class AssessmentSession:
+    """One in-progress assessment, kept as running per-dimension sums
+
+    `responses` holds one byte per question in the bank: 0 while unanswered,
+    otherwise the chosen option's number (MBTI) or the 1-5 answer (OCEAN), so
+    an answer can be changed by undoing its old contribution. For MBTI `sums`
+    counts the answers choosing each of MBTI_DIMENSIONS; for OCEAN it holds
+    each trait's sum of scored answers and `counts` their number.
+    """
+
+    __slots__ = ("session_id", "kind", "created_at", "expires_at", "responses", "answered", "sums", "counts")
+
+    def __init__(self, session_id, kind, bank_size, expires_at):
+        self.session_id = session_id
+        self.kind = kind
+        self.created_at = time.time()
+        self.expires_at = expires_at
+        self.responses = bytearray(bank_size)
+        self.answered = 0
+        if kind == "mbti":
+            self.sums = np.zeros(len(MBTI_DIMENSIONS), dtype=np.int64)
+            self.counts = None
+        else:
+            self.sums = np.zeros(len(OCEAN_TRAITS))
+            self.counts = np.zeros(len(OCEAN_TRAITS), dtype=np.int64)
+
+class SessionManager:
+    """In-memory assessment sessions that are scored as answers arrive
+
+    Answers are folded into the session's running sums when they are posted,
+    so partial results and finalizing cost the same however many questions
+    were answered. Sessions expire `ttl` seconds after their last use; beyond
+    `max_sessions` the least recently used session is evicted.
+    """
+
+    def __init__(self, question_generator, ttl=1800, max_sessions=100_000):
+        self.question_generator = question_generator
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        # Least recently used first, so expired sessions are always at the front
+        self.sessions = collections.OrderedDict()
+        self.created = 0
+        self.finalized = 0
+        self.expired = 0
+        self.evicted = 0
+        self._compile_questions()
+
+    def _compile_questions(self):
+        """Dimension of every MBTI option and trait, sign and offset of every OCEAN question"""
+        generator = self.question_generator
+        self.mbti_option_dimensions = [
+            [MBTI_DIMENSIONS.index(d) for d in q["dimensions"]] for q in generator.mbti_questions
+        ]
+        self.ocean_trait = generator.ocean_membership.argmax(axis=0).tolist()
+        self.ocean_sign = generator.ocean_weights.sum(axis=0).tolist()
+        self.ocean_offset = generator.ocean_offsets.sum(axis=0).tolist()
+
+    def bank(self, kind):
+        return self.question_generator.mbti_questions if kind == "mbti" else self.question_generator.ocean_questions
+
+    def create(self, kind):
+        """Start a new session"""
+        if kind not in ("mbti", "ocean"):
+            raise ValueError(f"Unknown assessment kind: {kind}")
+        self.evict_expired()
+        while len(self.sessions) >= self.max_sessions:
+            self.sessions.popitem(last=False)
+            self.evicted += 1
+
+        session_id = secrets.token_urlsafe(16)
+        session = AssessmentSession(session_id, kind, len(self.bank(kind)), time.monotonic() + self.ttl)
+        self.sessions[session_id] = session
+        self.created += 1
+        return session
+
+    def get(self, session_id):
+        """The live session with this id, extending its lifetime, or None"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        now = time.monotonic()
+        if session.expires_at <= now:
+            del self.sessions[session_id]
+            self.expired += 1
+            return None
+        session.expires_at = now + self.ttl
+        self.sessions.move_to_end(session_id)
+        return session
+
+    def answer(self, session, question_ids, answers):
+        """Fold answers into the session, replacing earlier answers to the same questions
+
+        Every answer is checked before any is applied, so a rejected request
+        leaves the session unchanged.
+        """
+        positions = self.question_generator.question_positions(question_ids, session.kind)
+        bank = self.bank(session.kind)
+        if session.kind == "mbti":
+            codes = []
+            for position, answer in zip(positions, answers):
+                options = bank[position]["options"]
+                if answer not in options:
+                    raise ValueError(f"Answer to MBTI question {bank[position]['id']} is not one of its options")
+                codes.append(options.index(answer) + 1)
+        else:
+            if any(not isinstance(answer, int) or not 1 <= answer <= 5 for answer in answers):
+                raise ValueError("Answers must be on a 1-5 scale")
+            codes = answers
+
+        for position, code in zip(positions, codes):
+            previous = session.responses[position]
+            if previous:
+                self._apply(session, position, previous, -1)
+            else:
+                session.answered += 1
+            self._apply(session, position, code, 1)
+            session.responses[position] = code
+
+    def _apply(self, session, position, code, direction):
+        """Add (direction 1) or remove (direction -1) one answer's contribution"""
+        if session.kind == "mbti":
+            session.sums[self.mbti_option_dimensions[position][code - 1]] += direction
+        else:
+            trait = self.ocean_trait[position]
+            session.sums[trait] += direction * (self.ocean_sign[position] * code + self.ocean_offset[position])
+            session.counts[trait] += direction
+
+    def score(self, session):
+        """Result for the answers so far, as QuestionGenerator scoring returns it
+
+        MBTI gives a (type, breakdown, confidence) tuple, or None before the
+        first answer; OCEAN gives the trait scores.
+        """
+        if session.kind == "mbti":
+            if session.answered == 0:
+                return None
+            types, breakdowns, confidences = self.question_generator.score_mbti_counts(
+                session.sums[None, :], np.array([session.answered])
+            )
+            return types[0], dict(zip(MBTI_DIMENSIONS, breakdowns[0].tolist())), float(confidences[0])
+
+        averages = np.divide(session.sums, session.counts, out=np.zeros(len(OCEAN_TRAITS)), where=session.counts > 0)
+        return dict(zip(OCEAN_TRAITS, averages.tolist()))
+
+    def answers(self, session):
+        """The session's answers in question bank order, as /predict/* takes them"""
+        bank = self.bank(session.kind)
+        return [
+            {
+                "question_id": bank[position]["id"],
+                "answer": bank[position]["options"][code - 1] if session.kind == "mbti" else code
+            }
+            for position, code in enumerate(session.responses) if code
+        ]
+
+    def finalize(self, session):
+        """Score the session and end it"""
+        if session.kind == "mbti" and session.answered == 0:
+            raise ValueError("No answers provided")
+        result = self.score(session)
+        self.sessions.pop(session.session_id, None)
+        self.finalized += 1
+        return result
+
+    def evict_expired(self):
+        """Drop sessions past their lifetime and return how many there were"""
+        now = time.monotonic()
+        count = 0
+        while self.sessions:
+            session = next(iter(self.sessions.values()))
+            if session.expires_at > now:
+                break
+            self.sessions.popitem(last=False)
+            count += 1
+        self.expired += count
+        return count
+
+    def stats(self):
+        return {
+            "active": len(self.sessions),
+            "created_total": self.created,
+            "finalized_total": self.finalized,
+            "expired_total": self.expired,
+            "evicted_total": self.evicted
+        }
@@ -4,7 +4,10 @@ Startup script for the Personality Assessment Backend
 This script will train models if they don't exist and start the API server
 """
 
+import argparse
+import importlib.util
 import os
+import secrets
 import sys
 import subprocess
 import time
@@ -13,6 +16,26 @@ from pathlib import Path
 # Add current directory to Python path for local imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Start the Personality Assessment Backend")
+    parser.add_argument("--production", action="store_true", default=os.getenv("BACKEND_ENV") == "production",
+                        help="Serve with several worker processes and no auto-reload (default when BACKEND_ENV=production)")
+    parser.add_argument("--host", default=os.getenv("SERVER_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVER_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVER_WORKERS", str(os.cpu_count() or 1))),
+                        help="Production worker processes (default: SERVER_WORKERS or the CPU count)")
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("SERVER_MAX_REQUESTS", "10000")),
+                        help="Requests a production worker serves before it is gracefully replaced, 0 to never recycle")
+    parser.add_argument("--max-requests-jitter", type=int, default=int(os.getenv("SERVER_MAX_REQUESTS_JITTER", "1000")),
+                        help="Random extra requests per worker so workers are not all recycled at once")
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv("SERVER_KEEP_ALIVE", "5")),
+                        help="Seconds an idle keep-alive connection is held open")
+    parser.add_argument("--backlog", type=int, default=int(os.getenv("SERVER_BACKLOG", "2048")),
+                        help="Pending connections the listening socket queues")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30")),
+                        help="Seconds a recycled or stopping worker gets to finish its requests")
+    return parser.parse_args()
+
 def check_requirements():
     """Check if all required packages are installed"""
     required_packages = [
@@ -45,6 +68,10 @@ def check_requirements():
 def train_models_if_needed():
     """Train models if they don't exist"""
     models_dir = Path("models")
+    # Trained models live in the version the registry's ACTIVE file points at
+    active = models_dir / "ACTIVE"
+    if active.exists():
+        models_dir = models_dir / "versions" / active.read_text().strip()
     mbti_model = models_dir / "mbti_model.pkl"
     ocean_model = models_dir / "ocean_model.pkl"
     
@@ -61,6 +88,74 @@ def train_models_if_needed():
     
     return True
 
+def production_command(args):
+    """Command line of the production server
+    
+    Uses gunicorn with uvicorn workers when it is installed: the app and its
+    models are loaded once in the master (--preload) and the forked workers
+    share those pages copy-on-write. Otherwise falls back to uvicorn's own
+    worker processes, which each load the app themselves.
+    """
+    if importlib.util.find_spec("gunicorn") is not None:
+        return [
+            sys.executable, "-m", "gunicorn", "api:app",
+            "--worker-class", "uvicorn.workers.UvicornWorker",
+            "--bind", f"{args.host}:{args.port}",
+            "--workers", str(args.workers),
+            "--preload",
+            "--max-requests", str(args.max_requests),
+            "--max-requests-jitter", str(args.max_requests_jitter),
+            "--keep-alive", str(args.keep_alive),
+            "--backlog", str(args.backlog),
+            "--graceful-timeout", str(args.graceful_timeout)
+        ]
+    
+    print("gunicorn is not installed; using uvicorn workers without preloading")
+    command = [
+        sys.executable, "-m", "uvicorn", "api:app",
+        "--host", args.host,
+        "--port", str(args.port),
+        "--workers", str(args.workers),
+        "--timeout-keep-alive", str(args.keep_alive),
+        "--backlog", str(args.backlog),
+        "--timeout-graceful-shutdown", str(args.graceful_timeout)
+    ]
+    if args.max_requests:
+        command += ["--limit-max-requests", str(args.max_requests)]
+    return command
+
+def share_question_token_secret(env):
+    """Give every server process the same QUESTION_TOKEN_SECRET
+    
+    Without one each worker, and each auto-reloaded process, signs question
+    tokens with its own random key and rejects the tokens of the others. A
+    secret set in the environment or in .env is kept.
+    """
+    from dotenv import dotenv_values
+    
+    if not env.get("QUESTION_TOKEN_SECRET") and not dotenv_values(".env").get("QUESTION_TOKEN_SECRET"):
+        env["QUESTION_TOKEN_SECRET"] = secrets.token_hex(32)
+    return env
+
+def start_production_server(args):
+    """Start the API with several worker processes and no file watcher"""
+    print(f"Starting API server in production mode with {args.workers} workers...")
+    print(f"API will be available at: http://{args.host}:{args.port}")
+    
+    env = os.environ.copy()
+    # Load models at import time so --preload loads them before forking
+    env["PRELOAD_MODELS"] = "1"
+    # Share the cores between the workers' inference executors
+    env.setdefault("INFERENCE_WORKERS", str(max(1, (os.cpu_count() or 1) // args.workers)))
+    share_question_token_secret(env)
+    
+    try:
+        subprocess.run(production_command(args), env=env)
+    except KeyboardInterrupt:
+        print("\nServer stopped")
+    except Exception as e:
+        print(f"Error starting server: {e}")
+
 def start_api_server():
     """Start the FastAPI server"""
     print("Starting API server...")
@@ -75,13 +170,14 @@ def start_api_server():
             "--host", "0.0.0.0", 
             "--port", "8000", 
             "--reload"
-        ])
+        ], env=share_question_token_secret(os.environ.copy()))
     except KeyboardInterrupt:
         print("\nServer stopped by user")
     except Exception as e:
         print(f"Error starting server: {e}")
 
 def main():
+    args = parse_args()
     print("=== Personality Assessment Backend Startup ===")
     
     # Ensure we're in the Back End directory
@@ -95,8 +191,9 @@ def main():
         print(f"Script location: {script_dir}")
         sys.exit(1)
     
-    # Check requirements
-    if not check_requirements():
+    # Check requirements; production images are built from the requirements
+    # files, so the slow import probe is skipped there
+    if not args.production and not check_requirements():
         sys.exit(1)
     
     # Train models if needed
@@ -104,7 +201,10 @@ def main():
         sys.exit(1)
     
     # Start the API server
-    start_api_server()
+    if args.production:
+        start_production_server(args)
+    else:
+        start_api_server()
 
 if __name__ == "__main__":
     main()
@@ -1,12 +1,30 @@
 #!/usr/bin/env python3
 """
 Simple test script to verify the API endpoints work correctly
+
+Checks that each endpoint answers correctly against a running server at
+API_BASE; the cold-start and serving-import checks start their own API
+process and, like the adaptive check, raise AssertionError on failure. The
+script exits with status 1 if any check fails. Throughput and latency are
+measured by benchmark_api.py.
 """
 
 import requests
 import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+API_BASE = os.getenv("API_BASE", "http://localhost:8000")
 
-API_BASE = "http://localhost:8000"
+# Seconds a freshly started API process may take to answer /health
+COLD_START_BUDGET = float(os.getenv("COLD_START_BUDGET", "3.0"))
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Packages only training needs, which the serving path must never import
+TRAINING_ONLY_MODULES = ("pandas", "sklearn", "kaggle", "torch")
 
 def test_health():
     """Test health endpoint"""
@@ -19,6 +37,51 @@ def test_health():
         print(f"Health check failed: {e}")
         return False
 
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def test_cold_start():
+    """Test that a new API process answers /health within the cold-start budget"""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port)],
+        cwd=BACKEND_DIR, env={**os.environ, "RESULT_STORE": "none"},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        response = None
+        while response is None and time.perf_counter() - started < COLD_START_BUDGET:
+            assert server.poll() is None, f"API process exited with code {server.returncode}"
+            try:
+                response = requests.get(f"http://127.0.0.1:{port}/health", timeout=0.5)
+            except requests.ConnectionError:
+                time.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        
+        assert response is not None, f"No /health answer within {COLD_START_BUDGET}s"
+        print(f"Cold start: /health answered after {elapsed:.2f}s (budget {COLD_START_BUDGET}s)")
+        print(f"Startup timings: {response.json().get('startup_seconds')}")
+        assert response.status_code == 200, f"/health returned {response.status_code}"
+        assert elapsed <= COLD_START_BUDGET, f"/health answered after {elapsed:.2f}s, budget {COLD_START_BUDGET}s"
+    finally:
+        server.terminate()
+        server.wait()
+
+def test_serving_imports():
+    """Test that importing the API loads none of the training-only packages"""
+    code = f"import sys, api; print(','.join(m for m in {TRAINING_ONLY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, env={**os.environ, "RESULT_STORE": "none"},
+        capture_output=True, text=True
+    )
+    assert result.returncode == 0, f"Importing the API failed: {result.stderr.strip()}"
+    loaded = result.stdout.strip()
+    print(f"Training-only packages imported by the API: {loaded or 'none'}")
+    assert not loaded, f"Importing the API loaded training-only packages: {loaded}"
+
 def test_mbti_questions():
     """Test MBTI questions endpoint"""
     try:
@@ -92,27 +155,67 @@ def test_ocean_prediction():
         print(f"OCEAN prediction test failed: {e}")
         return False
 
+def test_adaptive_ocean():
+    """Test an adaptive OCEAN assessment runs to a result in fewer questions than the bank"""
+    answers = []
+    while True:
+        response = requests.post(f"{API_BASE}/adaptive/ocean", json=answers)
+        assert response.status_code == 200, f"/adaptive/ocean returned {response.status_code}"
+        data = response.json()
+        if data["done"]:
+            break
+        question = data["next_question"]
+        answers.append({"question_id": question["id"], "answer": 4})
+    
+    print(f"Adaptive OCEAN: {response.status_code} after {len(answers)} questions")
+    print(f"Scores: {data.get('result', {}).get('scores')}")
+    assert data["result"] is not None, "Adaptive OCEAN finished without a result"
+    assert len(answers) < 39, f"Adaptive OCEAN asked all {len(answers)} questions"
+
+def test_malformed_question_token():
+    """Test that a question token with non-ASCII characters is rejected with a 400"""
+    token = "abc.\u00e9"
+    response = requests.get(f"{API_BASE}/questions/ocean", params={"token": token})
+    print(f"Malformed token on /questions/ocean: {response.status_code}")
+    assert response.status_code == 400, f"/questions/ocean returned {response.status_code}"
+    
+    answers = [{"question_id": 1, "answer": 4}]
+    response = requests.post(f"{API_BASE}/predict/ocean", json=answers, headers={"X-Question-Token": token})
+    print(f"Malformed token on /predict/ocean: {response.status_code}")
+    assert response.status_code == 400, f"/predict/ocean returned {response.status_code}"
+
 def main():
     print("=== API Testing ===")
     
     tests = [
         ("Health Check", test_health),
+        ("Cold Start", test_cold_start),
+        ("Serving Imports", test_serving_imports),
         ("MBTI Questions", test_mbti_questions),
         ("OCEAN Questions", test_ocean_questions),
         ("MBTI Prediction", test_mbti_prediction),
-        ("OCEAN Prediction", test_ocean_prediction)
+        ("OCEAN Prediction", test_ocean_prediction),
+        ("Adaptive OCEAN", test_adaptive_ocean),
+        ("Malformed Question Token", test_malformed_question_token)
     ]
     
     passed = 0
     for name, test_func in tests:
         print(f"\n--- {name} ---")
-        if test_func():
+        try:
+            # Endpoint checks return whether they passed; the others assert
+            ok = test_func() is not False
+        except Exception as e:
+            print(f"Check failed: {e}")
+            ok = False
+        if ok:
             passed += 1
             print("✓ PASSED")
         else:
             print("✗ FAILED")
     
     print(f"\n=== Results: {passed}/{len(tests)} tests passed ===")
+    sys.exit(0 if passed == len(tests) else 1)
 
 if __name__ == "__main__":
     main()
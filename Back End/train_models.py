@@ -4,57 +4,182 @@ Script to train MBTI and OCEAN personality models
 Run this script to download datasets and train the models
 """
 
+import argparse
 import os
 import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 from data_loader import DatasetLoader
-from models import MBTIModel, OCEANModel
-from config import MODEL_SAVE_PATH
+from models import MBTIModel, OCEANModel, split_n_jobs
+from model_registry import ModelRegistry
+from config import MODEL_SAVE_PATH, TRAIN_N_JOBS, TRAIN_PROCESSES
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the MBTI and OCEAN personality models")
+    parser.add_argument("--ocean-mode", choices=["per-trait", "multi-output"], default="per-trait",
+                        help="Train one forest per OCEAN trait or one multi-output forest")
+    parser.add_argument("--compare-ocean-modes", action="store_true",
+                        help="Also train the other OCEAN mode and report latency, memory and MSE differences")
+    parser.add_argument("--n-jobs", type=int, default=TRAIN_N_JOBS,
+                        help="Cores used to build each forest, -1 for all (default: TRAIN_N_JOBS)")
+    parser.add_argument("--processes", type=int, default=TRAIN_PROCESSES,
+                        help="Worker processes; above 1 the MBTI and OCEAN pipelines and the "
+                             "per-trait OCEAN forests are trained concurrently (default: TRAIN_PROCESSES)")
+    parser.add_argument("--refresh-data", action="store_true",
+                        help="Download the datasets again even if they are already in the data directory")
+    parser.add_argument("--no-activate", action="store_true",
+                        help="Publish the trained models as a new version without making the API serve it")
+    return parser.parse_args()
+
+def measure_ocean_model(model, X):
+    """Measure prediction latency and model size of a trained OCEAN model"""
+    single_row = X[:1]
+    model.predict(single_row)
+    start = time.perf_counter()
+    for _ in range(100):
+        model.predict(single_row)
+    single_latency = (time.perf_counter() - start) / 100
+    
+    start = time.perf_counter()
+    model.predict(X)
+    batch_latency = time.perf_counter() - start
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_path = os.path.join(tmp_dir, "ocean_model.pkl")
+        model.save(model_path)
+        file_size = os.path.getsize(model_path)
+    
+    compiled = model.compiled
+    compiled_size = sum(a.nbytes for a in [compiled.feature, compiled.threshold, compiled.children, compiled.value])
+    
+    return {
+        "single_row_ms": single_latency * 1000,
+        "batch_ms": batch_latency * 1000,
+        "file_mb": file_size / 2**20,
+        "compiled_mb": compiled_size / 2**20,
+        "nodes": len(compiled.threshold)
+    }
+
+def compare_ocean_modes(ocean_X, ocean_y, trained_model, trained_mse):
+    """Train the other OCEAN mode and print how the two modes compare"""
+    other_model = OCEANModel(
+        multi_output=not trained_model.multi_output, n_jobs=trained_model.n_jobs, processes=trained_model.processes
+    )
+    other_mse = other_model.train(ocean_X, ocean_y)
+
+    if trained_model.multi_output:
+        models, mse = [other_model, trained_model], [other_mse, trained_mse]
+    else:
+        models, mse = [trained_model, other_model], [trained_mse, other_mse]
+    stats = [measure_ocean_model(model, ocean_X) for model in models]
+
+    print("\n=== OCEAN Mode Comparison ===")
+    print(f"{'':<24}{'per-trait':>14}{'multi-output':>14}")
+    for key, label, spec in [("single_row_ms", "1-row predict (ms)", ".3f"),
+                             ("batch_ms", f"{len(ocean_X)}-row predict (ms)", ".3f"),
+                             ("file_mb", "saved size (MB)", ".2f"),
+                             ("compiled_mb", "node arrays (MB)", ".2f"),
+                             ("nodes", "tree nodes", ",d")]:
+        print(f"{label:<24}{stats[0][key]:>14{spec}}{stats[1][key]:>14{spec}}")
+    for trait in ['O', 'C', 'E', 'A', 'N']:
+        print(f"{trait + ' MSE':<24}{mse[0][trait]:>14.4f}{mse[1][trait]:>14.4f}")
+    print(f"{'mean MSE':<24}{np.mean(list(mse[0].values())):>14.4f}{np.mean(list(mse[1].values())):>14.4f}")
+
+def train_mbti_pipeline(n_jobs, refresh_data=False, model_dir=MODEL_SAVE_PATH):
+    """Download the MBTI dataset, then train and save the MBTI model"""
+    loader = DatasetLoader()
+    
+    # Download and preprocess MBTI data
+    print("\n=== Processing MBTI Dataset ===")
+    mbti_X, mbti_y, mbti_features = loader.download_mbti_dataset(refresh_data)
+    print(f"MBTI dataset shape: {mbti_X.shape}")
+    print(f"MBTI features: {len(mbti_features)}")
+    print(f"MBTI types: {len(set(mbti_y))}")
+    
+    # Train MBTI model
+    print("\n=== Training MBTI Model ===")
+    start = time.perf_counter()
+    mbti_model = MBTIModel(n_jobs=n_jobs)
+    mbti_accuracy = mbti_model.train(mbti_X, mbti_y)
+    mbti_model.save(os.path.join(model_dir, "mbti_model.pkl"))
+    print(f"MBTI model saved with accuracy: {mbti_accuracy:.3f} ({time.perf_counter() - start:.1f}s)")
+    
+    return mbti_accuracy
+
+def train_ocean_pipeline(ocean_mode, n_jobs, processes, compare_modes, refresh_data=False, model_dir=MODEL_SAVE_PATH):
+    """Download the OCEAN dataset, then train and save the OCEAN model"""
+    loader = DatasetLoader()
+    
+    # Download and preprocess OCEAN data
+    print("\n=== Processing OCEAN Dataset ===")
+    ocean_X, ocean_y, ocean_features, ocean_cols = loader.download_ocean_dataset(refresh_data)
+    print(f"OCEAN dataset shape: {ocean_X.shape}")
+    print(f"OCEAN features: {len(ocean_features)}")
+    print(f"OCEAN dimensions: {ocean_cols}")
+    
+    # Train OCEAN model
+    print("\n=== Training OCEAN Model ===")
+    start = time.perf_counter()
+    ocean_model = OCEANModel(multi_output=ocean_mode == "multi-output", n_jobs=n_jobs, processes=processes)
+    ocean_mse = ocean_model.train(ocean_X, ocean_y)
+    ocean_model.save(os.path.join(model_dir, "ocean_model.pkl"))
+    print(f"OCEAN model saved with MSE scores: {ocean_mse} ({time.perf_counter() - start:.1f}s)")
+    
+    if compare_modes:
+        compare_ocean_modes(ocean_X, ocean_y, ocean_model, ocean_mse)
+    
+    return ocean_mse
+
+def publish_version(registry, staging_dir, mbti_accuracy, ocean_mse, params, activate=True):
+    """Publish the models saved in staging_dir as a registry version, returning its name"""
+    version = registry.publish(staging_dir, metrics={
+        "mbti_accuracy": float(mbti_accuracy),
+        "ocean_mse": {trait: float(mse) for trait, mse in ocean_mse.items()}
+    }, params=params)
+    if activate:
+        registry.activate(version)
+    return version
 
 def main():
+    args = parse_args()
     print("Starting model training process...")
     
     # Create necessary directories
     os.makedirs(MODEL_SAVE_PATH, exist_ok=True)
     os.makedirs("data", exist_ok=True)
     
-    # Initialize data loader
-    loader = DatasetLoader()
+    # Models are saved into a staging directory and published as a new
+    # version only once both pipelines succeed
+    registry = ModelRegistry()
+    staging_dir = registry.create_staging()
     
     try:
-        # Download and preprocess MBTI data
-        print("\n=== Processing MBTI Dataset ===")
-        mbti_X, mbti_y, mbti_features = loader.download_mbti_dataset()
-        print(f"MBTI dataset shape: {mbti_X.shape}")
-        print(f"MBTI features: {len(mbti_features)}")
-        print(f"MBTI types: {len(set(mbti_y))}")
-        
-        # Train MBTI model
-        print("\n=== Training MBTI Model ===")
-        mbti_model = MBTIModel()
-        mbti_accuracy = mbti_model.train(mbti_X, mbti_y)
-        mbti_model.save(os.path.join(MODEL_SAVE_PATH, "mbti_model.pkl"))
-        print(f"MBTI model saved with accuracy: {mbti_accuracy:.3f}")
-        
-        # Download and preprocess OCEAN data
-        print("\n=== Processing OCEAN Dataset ===")
-        ocean_X, ocean_y, ocean_features, ocean_cols = loader.download_ocean_dataset()
-        print(f"OCEAN dataset shape: {ocean_X.shape}")
-        print(f"OCEAN features: {len(ocean_features)}")
-        print(f"OCEAN dimensions: {ocean_cols}")
+        if args.processes > 1:
+            # Run both pipelines side by side, splitting the cores between them
+            n_jobs = split_n_jobs(args.n_jobs, 2)
+            with ProcessPoolExecutor(max_workers=2) as pool:
+                mbti_future = pool.submit(train_mbti_pipeline, n_jobs, args.refresh_data, staging_dir)
+                ocean_future = pool.submit(train_ocean_pipeline, args.ocean_mode, n_jobs, args.processes,
+                                           args.compare_ocean_modes, args.refresh_data, staging_dir)
+                mbti_accuracy = mbti_future.result()
+                ocean_mse = ocean_future.result()
+        else:
+            mbti_accuracy = train_mbti_pipeline(args.n_jobs, args.refresh_data, staging_dir)
+            ocean_mse = train_ocean_pipeline(args.ocean_mode, args.n_jobs, 1, args.compare_ocean_modes,
+                                             args.refresh_data, staging_dir)
         
-        # Train OCEAN model
-        print("\n=== Training OCEAN Model ===")
-        ocean_model = OCEANModel()
-        ocean_mse = ocean_model.train(ocean_X, ocean_y)
-        ocean_model.save(os.path.join(MODEL_SAVE_PATH, "ocean_model.pkl"))
-        print(f"OCEAN model saved with MSE scores: {ocean_mse}")
+        version = publish_version(registry, staging_dir, mbti_accuracy, ocean_mse,
+                                  {"ocean_mode": args.ocean_mode}, activate=not args.no_activate)
         
         print("\n=== Training Complete ===")
-        print("Models are ready to use!")
+        print(f"Models saved as version {version}" + ("" if args.no_activate else " and activated"))
         print(f"MBTI model accuracy: {mbti_accuracy:.3f}")
         print(f"OCEAN model MSE: {ocean_mse}")
         
     except Exception as e:
+        registry.discard(staging_dir)
         print(f"Error during training: {str(e)}")
         sys.exit(1)
 
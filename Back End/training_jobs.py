@@ -0,0 +1,180 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import time
+import uuid
+from model_registry import ModelRegistry
+from metrics import REGISTRY, DURATION_BUCKETS
+from config import DATA_PATH, TRAIN_N_JOBS, TRAIN_PROCESSES, TRAINING_JOBS_KEPT
+
+STAGES = ["training_mbti", "training_ocean", "loading_models"]
+
+TRAINING_JOB_SECONDS = REGISTRY.histogram(
+    "training_job_duration_seconds", "Duration of finished training jobs", ("status",), DURATION_BUCKETS
+)
+TRAINING_STAGE_SECONDS = REGISTRY.histogram(
+    "training_stage_duration_seconds", "Duration of each training job stage", ("stage",), DURATION_BUCKETS
+)
+
+def run_training_job(progress, ocean_mode, n_jobs, processes):
+    """Download the datasets, train both models and publish them as the active version
+
+    Runs in a separate process and reports ("stage", name), ("done", metrics)
+    or ("error", message) messages on the `progress` queue.
+    """
+    # Imported here so the API process never loads the training stack
+    from train_models import train_mbti_pipeline, train_ocean_pipeline, publish_version
+
+    registry = ModelRegistry()
+    staging_dir = None
+    try:
+        os.makedirs(DATA_PATH, exist_ok=True)
+        staging_dir = registry.create_staging()
+
+        progress.put(("stage", "training_mbti"))
+        mbti_accuracy = train_mbti_pipeline(n_jobs, model_dir=staging_dir)
+
+        progress.put(("stage", "training_ocean"))
+        ocean_mse = train_ocean_pipeline(ocean_mode, n_jobs, processes, False, model_dir=staging_dir)
+
+        version = publish_version(registry, staging_dir, mbti_accuracy, ocean_mse, {"ocean_mode": ocean_mode})
+        progress.put(("done", {
+            "version": version,
+            "mbti_accuracy": float(mbti_accuracy),
+            "ocean_mse": {k: float(v) for k, v in ocean_mse.items()}
+        }))
+    except Exception as e:
+        if staging_dir is not None:
+            registry.discard(staging_dir)
+        progress.put(("error", str(e)))
+
+class TrainingJobRunning(Exception):
+    """Raised when a training job is submitted while another one is running"""
+
+class TrainingJob:
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = "queued"
+        self.stage = None
+        self.metrics = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        # Task following the training process, kept so it is not garbage collected
+        self.task = None
+
+    @property
+    def progress(self):
+        """Fraction of the training stages completed"""
+        if self.status == "succeeded":
+            return 1.0
+        if self.stage is None:
+            return 0.0
+        return STAGES.index(self.stage) / len(STAGES)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "metrics": self.metrics,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+class TrainingJobManager:
+    """Runs model training in a separate process, one job at a time
+
+    `on_success` is awaited with the finished job once the new models are
+    published and activated; it is expected to load them and swap them in.
+    Only the `max_finished_jobs` most recent finished jobs are kept.
+    """
+
+    def __init__(self, on_success, max_finished_jobs=TRAINING_JOBS_KEPT):
+        self.on_success = on_success
+        self.max_finished_jobs = max_finished_jobs
+        # Oldest first
+        self.jobs = {}
+        self.running = None
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def submit(self, ocean_mode="per-trait", n_jobs=TRAIN_N_JOBS, processes=TRAIN_PROCESSES):
+        """Start a training job; must be called from the event loop"""
+        if self.running is not None:
+            raise TrainingJobRunning(f"Training job {self.running.id} is already running")
+
+        job = TrainingJob(uuid.uuid4().hex)
+        # spawn rather than fork so the child does not inherit the event loop
+        # and its threads
+        context = multiprocessing.get_context("spawn")
+        progress = context.Queue()
+        process = context.Process(target=run_training_job, args=(progress, ocean_mode, n_jobs, processes))
+        process.start()
+
+        job.status = "running"
+        self._prune()
+        self.jobs[job.id] = job
+        self.running = job
+        job.task = asyncio.create_task(self._watch(job, process, progress))
+        job.task.add_done_callback(self._watch_done)
+        return job
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished_jobs"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    def _watch_done(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error following training job: {str(task.exception())}")
+
+    async def _watch(self, job, process, progress):
+        """Follow a job's progress messages until it finishes"""
+        loop = asyncio.get_running_loop()
+        stage_started = time.monotonic()
+
+        def finish_stage():
+            nonlocal stage_started
+            if job.stage is not None:
+                TRAINING_STAGE_SECONDS.observe(time.monotonic() - stage_started, job.stage)
+            stage_started = time.monotonic()
+
+        try:
+            while job.status == "running":
+                try:
+                    kind, payload = await loop.run_in_executor(None, progress.get, True, 1.0)
+                except queue.Empty:
+                    if not process.is_alive() and progress.empty():
+                        self._fail(job, f"Training process exited with code {process.exitcode}")
+                    continue
+
+                if kind == "stage":
+                    finish_stage()
+                    job.stage = payload
+                elif kind == "error":
+                    self._fail(job, payload)
+                elif kind == "done":
+                    job.metrics = payload
+                    finish_stage()
+                    job.stage = "loading_models"
+                    await self.on_success(job)
+                    finish_stage()
+                    job.status = "succeeded"
+                    job.finished_at = time.time()
+        except Exception as e:
+            self._fail(job, f"Error installing trained models: {str(e)}")
+        finally:
+            self.running = None
+            TRAINING_JOB_SECONDS.observe(time.time() - job.created_at, job.status)
+            await loop.run_in_executor(None, process.join)
+
+    def _fail(self, job, error):
+        job.status = "failed"
+        job.error = error
+        job.finished_at = time.time()